@@ -0,0 +1,97 @@
+# benchmarks/corpus.py
+"""Deterministic synthetic support-email corpus for benchmarks."""
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+TOPICS = {
+    "login": [
+        "I cannot access my account since this morning, the password reset email never arrives.",
+        "My account is locked after too many login attempts and I need to get back in.",
+        "Two-factor authentication codes are not working on my new phone.",
+    ],
+    "billing": [
+        "My payment failed again even though the card is valid, please check order ORD-{n}.",
+        "I was charged twice for my Pro subscription, I want a refund for invoice #{n}.",
+        "How do I switch from PayPal to bank transfer for the next billing cycle?",
+    ],
+    "technical": [
+        "The app is not working in Chrome 90, pages stay blank after login.",
+        "Data sync has been broken for two days, my files do not show up on mobile.",
+        "Performance is terrible, every page takes 30 seconds to load.",
+    ],
+    "features": [
+        "What is the maximum file size I can upload to a shared workspace?",
+        "Can you explain how to export all my data from Settings?",
+        "Is there an API for Enterprise plans and what is the rate limit?",
+    ],
+    "security": [
+        "I noticed suspicious activity in my account, someone logged in from another country.",
+        "Please delete my personal data under GDPR as soon as possible.",
+    ],
+}
+
+URGENCY = {
+    "urgent": ["This is urgent, please help immediately!", "Critical: our whole team is blocked, ASAP please."],
+    "medium": ["I would appreciate help with this issue.", "This problem is getting frustrating."],
+    "low": ["No rush, just a question when you have time.", "Thanks in advance for your help."],
+}
+
+# Short non-English openers so language detection / tokenisation sees realistic noise
+LANGUAGES = {
+    "en": "Hello support team,",
+    "es": "Hola equipo de soporte, necesito ayuda con mi cuenta.",
+    "fr": "Bonjour l'équipe support, j'ai un problème avec mon compte.",
+    "de": "Hallo Support-Team, ich habe ein Problem mit meinem Konto.",
+}
+
+SUBJECT_PREFIXES = ["Support request", "Help needed", "Query about", "Request:"]
+NON_SUPPORT_SUBJECTS = ["Newsletter: product updates", "Your weekly digest", "Invitation to webinar"]
+
+FILLER = ("We have been customers for several years and generally happy with the service. "
+          "Our team uses the product daily for planning and reporting. ")
+
+def _quoted_thread(rng, body, depth):
+    quoted = body
+    for i in range(depth):
+        when = format_datetime(datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=rng.randint(1, 5000)))
+        quoted = f"Any update on this?\n\nOn {when}, Customer Support wrote:\n" + "\n".join(
+            "> " + line for line in quoted.splitlines())
+    return quoted
+
+def generate_corpus(n=200, seed=42, support_ratio=0.9):
+    """Return `n` Gmail-shaped email dicts (id, threadId, sender, subject, body, date)."""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc)
+    emails = []
+    for i in range(n):
+        topic = rng.choice(list(TOPICS))
+        urgency = rng.choices(["urgent", "medium", "low"], weights=[2, 5, 3])[0]
+        language = rng.choices(list(LANGUAGES), weights=[7, 1, 1, 1])[0]
+        size = rng.choices(["short", "medium", "long"], weights=[5, 4, 1])[0]
+
+        issue = rng.choice(TOPICS[topic]).format(n=rng.randint(10000, 99999))
+        parts = [LANGUAGES[language], issue, rng.choice(URGENCY[urgency])]
+        if size == "medium":
+            parts.insert(2, FILLER * 3)
+        elif size == "long":
+            parts.insert(2, FILLER * 40)
+        if rng.random() < 0.3:
+            parts.append(f"You can reach me at +1 555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}.")
+        body = "\n\n".join(parts)
+        if rng.random() < 0.25:
+            body = _quoted_thread(rng, body, depth=rng.randint(1, 3))
+
+        if rng.random() < support_ratio:
+            subject = f"{rng.choice(SUBJECT_PREFIXES)} {topic}"
+        else:
+            subject = rng.choice(NON_SUPPORT_SUBJECTS)
+        emails.append({
+            "id": f"bench{i:06d}",
+            "threadId": f"thread{rng.randint(0, max(1, n // 3)):06d}",
+            "sender": f"Customer {i % 50} <customer{i % 50}@example.com>",
+            "subject": subject,
+            "body": body,
+            "date": format_datetime(now - timedelta(minutes=rng.randint(0, 60 * 24 * 14))),
+        })
+    return emails
@@ -0,0 +1,133 @@
+# benchmarks/fakes.py
+"""Offline stand-ins for Gmail, the embedding model and the OpenAI client."""
+import base64
+import time
+import zlib
+from contextlib import contextmanager
+import numpy as np
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode()
+
+def to_gmail_message(email):
+    """Render a corpus email as a Gmail API `messages.get` response."""
+    headers = [
+        {"name": "From", "value": email["sender"]},
+        {"name": "Subject", "value": email["subject"]},
+        {"name": "Date", "value": email["date"]},
+    ]
+    # Alternate between single-part and multipart bodies like a real mailbox
+    if zlib.crc32(email["id"].encode()) % 2:
+        payload = {"mimeType": "text/plain", "headers": headers, "body": {"data": _b64(email["body"])}}
+    else:
+        payload = {"mimeType": "multipart/alternative", "headers": headers, "body": {"size": 0}, "parts": [
+            {"mimeType": "text/plain", "body": {"data": _b64(email["body"])}},
+            {"mimeType": "text/html", "body": {"data": _b64(f"<p>{email['body']}</p>")}},
+        ]}
+    return {"id": email["id"], "threadId": email.get("threadId", email["id"]), "payload": payload,
+            "internalDate": str(int(time.time() * 1000))}
+
+class _Request:
+    def __init__(self, result, latency):
+        self.result = result
+        self.latency = latency
+
+    def execute(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.result
+
+class _Messages:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, userId="me", maxResults=100, pageToken=None, q=None, **kwargs):
+        start = int(pageToken or 0)
+        ids = self.service.order[start:start + maxResults]
+        result = {"messages": [{"id": i, "threadId": self.service.messages[i]["threadId"]} for i in ids],
+                  "resultSizeEstimate": len(self.service.order)}
+        if start + maxResults < len(self.service.order):
+            result["nextPageToken"] = str(start + maxResults)
+        return _Request(result, self.service.latency)
+
+    def get(self, userId="me", id=None, **kwargs):
+        return _Request(self.service.messages[id], self.service.latency)
+
+    def send(self, userId="me", body=None):
+        self.service.sent.append(body)
+        return _Request({"id": f"sent{len(self.service.sent)}"}, self.service.latency)
+
+class _Users:
+    def __init__(self, service):
+        self.service = service
+        self._messages = _Messages(service)
+
+    def messages(self):
+        return self._messages
+
+    def getProfile(self, userId="me"):
+        return _Request({"emailAddress": self.service.address}, self.service.latency)
+
+class FakeGmailService:
+    """Minimal in-memory implementation of the Gmail API calls used by gmails_tools."""
+
+    def __init__(self, emails, latency=0.0, address="support@example.com"):
+        self.address = address
+        self.messages = {e["id"]: to_gmail_message(e) for e in emails}
+        self.order = [e["id"] for e in emails]
+        self.latency = latency
+        self.sent = []
+        self._users = _Users(self)
+
+    def users(self):
+        return self._users
+
+class FakeEmbeddingModel:
+    """Deterministic hashed bag-of-words encoder with the SentenceTransformer `encode` signature."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                out[row, zlib.crc32(token.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+class FakeOpenAI:
+    """Replaces the `openai` module: ChatCompletion.create returns a canned reply after `latency` seconds."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.api_key = None
+        self.ChatCompletion = self
+
+    def create(self, model=None, messages=None, max_tokens=200, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = messages[-1]["content"] if messages else ""
+        return {
+            "choices": [{"message": {"content": "Thanks for reaching out. We are looking into this and will update you shortly."}}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 16,
+                      "total_tokens": len(prompt.split()) + 16},
+        }
+
+@contextmanager
+def patched(module, **attrs):
+    """Temporarily replace module attributes."""
+    missing = object()
+    saved = {name: getattr(module, name, missing) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is missing:
+                delattr(module, name)
+            else:
+                setattr(module, name, value)
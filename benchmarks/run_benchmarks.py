@@ -0,0 +1,214 @@
+# benchmarks/run_benchmarks.py
+"""Reproducible performance benchmarks for the ingestion path.
+
+Runs a synthetic support-email corpus through each pipeline stage with
+offline fakes for Gmail, the embedding model and the LLM, then reports
+throughput, p50/p95/p99 latency and peak traced memory per stage.
+
+    python benchmarks/run_benchmarks.py                   # run and compare against the baseline
+    python benchmarks/run_benchmarks.py --save-baseline   # record a new baseline
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def measure(name, func, items, memory=True):
+    """Time func(item) for every item, then repeat under tracemalloc for peak memory."""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+
+    peak_mb = None
+    if memory:
+        # Separate pass so tracing overhead does not distort the latency numbers
+        tracemalloc.start()
+        for item in items:
+            func(item)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "stage": name,
+        "ops": len(items),
+        "throughput_per_s": len(items) / total if total else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_mb": peak_mb,
+    }
+
+def run(args):
+    if args.offline:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    import email_processor
+    import response_generator
+    import gmails_tools
+    import dedup
+    from rag_system import RAGSystem, HYBRID_SHORTLIST
+    from inverted_index import InvertedIndex
+    from database import Database
+    from corpus import generate_corpus
+    from fakes import FakeGmailService, FakeEmbeddingModel, FakeOpenAI, patched
+
+    if args.no_sentiment_model:
+        email_processor._sent_pipeline = None
+
+    corpus = generate_corpus(n=args.emails, seed=args.seed)
+    kb_path = os.path.join(ROOT, "data", "knowledge_base.txt")
+    model = FakeEmbeddingModel() if args.fake_embeddings else None
+    rag = RAGSystem(kb_path, model=model, embedding_dtype=args.embedding_dtype, backend=args.backend,
+                    retrieval=args.retrieval)
+    processor = email_processor.EmailProcessor(rag_system=rag)
+    responder = response_generator.ResponseGenerator(rag_system=rag)
+    processed = {e["id"]: processor.process_email(e) for e in corpus}
+    queries = [f"{e['subject']} {e['body']}" for e in corpus]
+
+    results = [
+        measure("process_email", processor.process_email, corpus, args.memory),
+        measure("retrieve_relevant_context", rag.retrieve_relevant_context, queries, args.memory),
+        measure("inverted_index_build", lambda _: InvertedIndex(rag.knowledge_chunks),
+                range(args.index_builds), args.memory),
+    ]
+    index = rag.index or InvertedIndex(rag.knowledge_chunks)
+    results.append(measure("inverted_index_search", lambda q: index.search(q, HYBRID_SHORTLIST),
+                           queries, args.memory))
+
+    with patched(response_generator, OPENAI_KEY=None):
+        results.append(measure("generate_response[template]",
+                               lambda e: responder.generate_response(e, dict(processed[e["id"]])),
+                               corpus, args.memory))
+    fake_llm = FakeOpenAI(latency=args.llm_latency)
+    with patched(response_generator, OPENAI_KEY="benchmark", OPENAI_AVAILABLE=True, openai=fake_llm):
+        results.append(measure("generate_response[fake_llm]",
+                               lambda e: responder.generate_response(e, dict(processed[e["id"]])),
+                               corpus, args.memory))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "emails.db"))
+        results.append(measure("save_email", lambda e: db.save_email(e, processed[e["id"]], "draft"),
+                               corpus, args.memory))
+        batches = [corpus[i:i + args.fetch_batch] for i in range(0, len(corpus), args.fetch_batch)]
+        results.append(measure("dedup_plan", lambda emails: dedup.plan(emails, db), batches, args.memory))
+        # First pass fills the analysis cache, the second measures re-fetches of unchanged emails
+        cached = email_processor.EmailProcessor(rag_system=rag, cache=db)
+        for e in corpus:
+            cached.process_email(e)
+        results.append(measure("process_email[cached]", cached.process_email, corpus, args.memory))
+        db.conn.close()
+
+    service = FakeGmailService(corpus, latency=args.gmail_latency)
+    batch = args.fetch_batch
+    batches = list(range(0, len(corpus), batch))
+    with patched(gmails_tools, get_service=lambda *a, **kw: service):
+        results.append(measure("fetch_support_emails", lambda _: gmails_tools.fetch_support_emails(max_results=batch),
+                               batches, args.memory))
+        # Whole mailbox through the paginated generator, consumed one message at a time
+        results.append(measure("iter_support_emails[mailbox]",
+                               lambda _: sum(1 for _ in gmails_tools.iter_support_emails(page_size=batch)),
+                               [None], args.memory))
+    return results
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against the baseline."""
+    regressions = []
+    base = {r["stage"]: r for r in baseline.get("results", [])}
+    for r in results:
+        b = base.get(r["stage"])
+        if not b:
+            continue
+        if b["p95_ms"] and r["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['stage']}: p95 {r['p95_ms']:.2f}ms vs baseline {b['p95_ms']:.2f}ms")
+        if b["throughput_per_s"] and r["throughput_per_s"] < b["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{r['stage']}: throughput {r['throughput_per_s']:.1f}/s "
+                               f"vs baseline {b['throughput_per_s']:.1f}/s")
+    return regressions
+
+def print_table(results):
+    print(f"{'stage':<30} {'ops':>6} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for r in results:
+        peak = f"{r['peak_mb']:.2f}" if r["peak_mb"] is not None else "-"
+        print(f"{r['stage']:<30} {r['ops']:>6} {r['throughput_per_s']:>10.1f} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {peak:>8}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the email processing pipeline")
+    parser.add_argument("--emails", type=int, default=200, help="Size of the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fetch-batch", type=int, default=10, help="max_results per fetch_support_emails call")
+    parser.add_argument("--gmail-latency", type=float, default=0.0, help="Simulated seconds per Gmail API call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use a hashed encoder instead of all-MiniLM-L6-v2")
+    parser.add_argument("--backend", choices=["dense", "lexical"], default="dense",
+                        help="Retrieval backend (--fake-embeddings implies dense)")
+    parser.add_argument("--retrieval", choices=["dense", "hybrid"], default="dense",
+                        help="Full dense scan, or BM25 shortlist + dense rerank")
+    parser.add_argument("--index-builds", type=int, default=5, help="Repetitions of the inverted index build stage")
+    parser.add_argument("--embedding-dtype", choices=["float32", "float16", "int8"], default="float32",
+                        help="Storage dtype for knowledge base embeddings")
+    parser.add_argument("--no-sentiment-model", action="store_true", help="Use the keyword sentiment fallback")
+    parser.add_argument("--offline", action="store_true", help="Forbid Hugging Face downloads")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc pass")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing")
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    print_table(results)
+
+    report = {"config": {k: v for k, v in vars(args).items() if k not in ("baseline", "output", "save_baseline")},
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != report["config"]:
+        print("Warning: baseline was recorded with a different configuration.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("No regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,50 +1,161 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-from src.gmails_tools import fetch_support_emails, send_reply
-from src.email_processor import EmailProcessor
-from src.response_generator import ResponseGenerator
-from src.database import Database
+# Imported by the same module names the src modules use, so there is a single metrics registry
+from email_processor import EmailProcessor
+from response_generator import ResponseGenerator
+from rag_system import RAGSystem
+from database import Database
+from worker import Worker
+import metrics
 
 def main():
-    print("Fetching emails...")
-    emails = fetch_support_emails(max_results=10)
-    if not emails:
-        print("No support emails found.")
-        return
-
-    processor = EmailProcessor()
-    responder = ResponseGenerator()
+    # accounts pulls in the Gmail client on first use; imported here so the other commands run without it
+    from accounts import load_accounts, poll_accounts
+    accounts = load_accounts()
+    print(f"Fetching emails for {', '.join(a.name for a in accounts)}...")
+
+    # One RAGSystem (embedding model + chunk embeddings) shared by both stages and every account
+    rag_system = RAGSystem()
+    db = Database()
+    processor = EmailProcessor(rag_system=rag_system, cache=db)
+    responder = ResponseGenerator(rag_system=rag_system)
+
+    for name, counts in poll_accounts(accounts, processor, responder, db).items():
+        if "error" in counts:
+            print(f"[{name}] failed: {counts['error']}")
+        else:
+            print(f"[{name}] processed {counts['processed']}, grouped {counts['deduplicated']}, sent {counts['sent']}")
+    print_analysis_cache()
+
+def print_analysis_cache():
+    rate = metrics.REGISTRY.cache_hit_rates().get("analysis")
+    if rate is not None:
+        print(f"Analysis cache hit rate: {rate:.0%}")
+
+def run_worker(args):
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+        print(f"Prometheus metrics at http://localhost:{args.metrics_port}/metrics")
+    worker = Worker(lease_seconds=args.lease)
+    try:
+        worker.run_forever(interval=args.interval, jitter=args.jitter, max_batch=args.max_batch)
+    except KeyboardInterrupt:
+        print("Worker interrupted")
+
+def run_rescore(args):
+    from rescore import rescore, format_summary
+    summary = rescore(Database(), chunk_size=args.chunk_size, statuses=args.status, dry_run=args.dry_run,
+                      log=lambda msg: None)
+    print(format_summary(summary))
+
+def run_archive(args):
+    from archive import Archive, archive_old_emails
+    archive = Archive()
+    result = archive_old_emails(Database(), archive, older_than_days=args.older_than_days,
+                                batch_size=args.batch_size, vacuum=args.vacuum, log=lambda msg: None)
+    stats = archive.stats()
+    print(f"Archived {result['archived']} emails received before {result['cutoff']} UTC "
+          f"({result['raw_bytes'] / 1024:.1f} KB of body/draft text); "
+          f"pruned {result['analyses_pruned']} cached analyses")
+    print(f"Archive holds {stats['emails']} emails in {stats['compressed_bytes'] / 1024:.1f} KB compressed")
+
+def run_search_archive(args):
+    from archive import Archive
+    for row in Archive().search(args.query, limit=args.limit):
+        print(f"{row['id']}  {row['received_at']}  {row['status']:<8}  {row['sender']}  |  {row['subject']}")
+
+def run_restore(args):
+    from archive import Archive, restore_email
+    db, archive = Database(), Archive()
+    for email_id in args.ids:
+        print(f"{email_id}: {'restored' if restore_email(db, archive, email_id) else 'not in archive'}")
+
+def run_import(args):
+    import email_processor
+    from accounts import load_accounts
+    from mail_import import import_mailbox
+    if args.keyword_sentiment:
+        email_processor._sent_pipeline = None
+    rag_system = RAGSystem()
     db = Database()
+    processor = EmailProcessor(rag_system=rag_system, cache=db)
+    responder = ResponseGenerator(rag_system=rag_system, use_llm=not args.template_drafts)
+    # Our own addresses, from the accounts file and from earlier polls, so imported replies are skipped
+    own = {a for account in load_accounts() for a in account.addresses}
+    own.update(row["address"] for row in db.list_accounts() if row["address"])
+    totals = import_mailbox(args.path, processor, responder, db, fmt=args.format, my_email=sorted(own),
+                            batch_size=args.batch_size, limit=args.limit, rate=args.rate,
+                            support_only=not args.all, restart=args.restart, auto_send_urgent=args.auto_send,
+                            account=args.account)
+    print(f"Read {totals['read']} messages in {totals['seconds']:.1f}s ({totals['per_minute']:.0f}/min): "
+          f"{totals['processed']} processed, {totals['deduplicated']} grouped, {totals['skipped']} skipped, "
+          f"{totals['sent']} sent. Checkpoint at message {totals['position']}.")
+    print_analysis_cache()
 
-    my_email = "idf6877@gmail.com"  # <-- Replace with your actual Gmail address
-    import re
-    def extract_email(sender):
-        match = re.search(r'<(.+?)>', sender)
-        if match:
-            return match.group(1)
-        return sender.strip()
-
-    for email in emails:
-        if db.is_replied(email["id"]):
-            print(f"Reply already sent for: {email['subject']}")
-            continue
-        sender_email = extract_email(email["sender"]).lower()
-        if sender_email == my_email.lower():
-            continue
-        processed = processor.process_email(email)
-        draft = responder.generate_response(email, processed)
-        db.save_email(email, processed, draft)
-        print(f"Processed: {email['subject']} | Priority: {processed['priority_label']}")
-
-        # Auto-send urgent replies (optional)
-        if processed["priority_label"] == "Urgent":
-            print(f"Sending auto-reply to {email['sender']}")
-            send_reply(email["sender"], email["subject"], draft)
-            # Mark as replied
-            cur = db.conn.cursor()
-            cur.execute("UPDATE emails SET status='Replied' WHERE id=?", (email["id"],))
-            db.conn.commit()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AI email support assistant")
+    parser.add_argument("--trace", action="store_true", help="Record per-email trace spans")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Load every model and print memory used per component, then exit")
+    sub = parser.add_subparsers(dest="command")
+    worker = sub.add_parser("worker", help="Run the background worker that processes queued jobs")
+    worker.add_argument("--interval", type=float, default=60, help="Seconds between scheduled mailbox fetches")
+    worker.add_argument("--jitter", type=float, default=10, help="Random extra seconds added to each interval")
+    worker.add_argument("--max-batch", type=int, default=10, help="Maximum emails fetched per run")
+    worker.add_argument("--lease", type=float, default=600, help="Seconds a claimed job stays leased to this worker after its last heartbeat")
+    worker.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    rescore = sub.add_parser("rescore", help="Recompute priorities of stored emails with the current rules")
+    rescore.add_argument("--chunk-size", type=int, default=1000, help="Emails read and written per transaction")
+    rescore.add_argument("--status", action="append",
+                         help="Only rescore emails with this status (repeatable, e.g. --status Pending)")
+    rescore.add_argument("--dry-run", action="store_true", help="Report label changes without writing them")
+    archive = sub.add_parser("archive", help="Move old Resolved/Replied emails to the compressed archive")
+    archive.add_argument("--older-than-days", type=float, default=30, help="Retention age of the hot table")
+    archive.add_argument("--batch-size", type=int, default=500, help="Emails moved per transaction")
+    archive.add_argument("--vacuum", action="store_true", help="Compact emails.db afterwards")
+    search = sub.add_parser("search-archive", help="Full-text search of archived emails")
+    search.add_argument("query", help="Search terms (SQLite FTS5 syntax)")
+    search.add_argument("--limit", type=int, default=50)
+    restore = sub.add_parser("restore", help="Move archived emails back into the hot table")
+    restore.add_argument("ids", nargs="+", help="Email ids to restore")
+    importer = sub.add_parser("import-mail", help="Ingest a local mbox file or Maildir folder (resumable)")
+    importer.add_argument("path", help="mbox file or Maildir directory")
+    importer.add_argument("--format", choices=["mbox", "maildir"], help="Default: Maildir for directories, else mbox")
+    importer.add_argument("--batch-size", type=int, default=50, help="Messages per batch and checkpoint")
+    importer.add_argument("--limit", type=int, help="Stop after this many messages")
+    importer.add_argument("--rate", type=float, help="Replay at this many messages per second (load testing)")
+    importer.add_argument("--all", action="store_true", help="Import every message, not only support subjects")
+    importer.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint")
+    importer.add_argument("--template-drafts", action="store_true", help="Skip LLM calls and use the template")
+    importer.add_argument("--keyword-sentiment", action="store_true", help="Skip the sentiment model")
+    importer.add_argument("--auto-send", action="store_true", help="Auto-send urgent replies (off for imports)")
+    importer.add_argument("--account", help="Store imported emails under this account name")
+    for subparser in sub.choices.values():
+        # Also accepted after the subcommand; SUPPRESS keeps a --trace given before it
+        subparser.add_argument("--trace", action="store_true", default=argparse.SUPPRESS,
+                               help="Record per-email trace spans")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.trace:
+        metrics.REGISTRY.tracing = True
+    if args.memory_report:
+        from memory_report import print_report
+        print_report()
+    elif args.command == "worker":
+        run_worker(args)
+    elif args.command == "rescore":
+        run_rescore(args)
+    elif args.command == "archive":
+        run_archive(args)
+    elif args.command == "search-archive":
+        run_search_archive(args)
+    elif args.command == "restore":
+        run_restore(args)
+    elif args.command == "import-mail":
+        run_import(args)
+    else:
+        main()
@@ -1,16 +1,16 @@
 # scripts/clear_database.py
-import sqlite3
+import sys
 import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from src.database import Database
 
 DB_PATH = "db/emails.db"
 
 def clear_database():
     if os.path.exists(DB_PATH):
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM emails")
-        conn.commit()
-        conn.close()
+        # Goes through Database so the analytics rollups are cleared too
+        Database(DB_PATH).clear()
         print("Database cleared successfully!")
     else:
         print("Database file not found.")
@@ -1,4 +1,5 @@
 from __future__ import print_function
+import argparse
 import os
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -8,9 +9,14 @@ from googleapiclient.discovery import build
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 
 def main():
+    # One token per mailbox: pass --token secrets/token-<account>.json for each account in secrets/accounts.json
+    parser = argparse.ArgumentParser(description="Authorize Gmail access and store the token")
+    parser.add_argument("--token", default='secrets/token.json', help="Where to store the token")
+    parser.add_argument("--credentials", default='secrets/credentials.json', help="OAuth client file")
+    args = parser.parse_args()
     creds = None
-    token_path = 'secrets/token.json'
-    cred_path = 'secrets/credentials.json'
+    token_path = args.token
+    cred_path = args.credentials
 
     if os.path.exists(token_path):
         creds = Credentials.from_authorized_user_file(token_path, SCOPES)
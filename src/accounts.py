@@ -0,0 +1,177 @@
+# src/accounts.py
+"""Multi-mailbox support: per-account credentials, sync cursors, quotas and self addresses.
+
+Accounts are listed in secrets/accounts.json (or the file named by
+EMAIL_ACCOUNTS):
+
+    {"accounts": [
+        {"name": "support", "token_path": "secrets/token.json", "addresses": ["support@example.com"]},
+        {"name": "billing", "token_path": "secrets/token-billing.json", "daily_quota": 200}
+    ]}
+
+Without the file there is a single "default" account using TOKEN_PATH. An
+account without "addresses" takes its own address from the Gmail profile.
+poll_accounts fetches every mailbox concurrently, one thread per account,
+while analysis runs one batch at a time on the shared models.
+"""
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from text_utils import is_support_subject
+from worker import PROCESS_BATCH, process_new_emails
+
+ACCOUNTS_PATH = os.environ.get("EMAIL_ACCOUNTS", "secrets/accounts.json")
+DEFAULT_ACCOUNT = "default"
+DEFAULT_MAX_PER_POLL = 10
+# Message ids listed at a time once a cursor exists, and messages downloaded per poll, bounding the
+# memory and work of catching up after downtime
+MAX_SCAN = 500
+
+def _list_after(service, cursor, query=None):
+    """Ids of messages newer than `cursor`, oldest first, at most MAX_SCAN of them.
+
+    Gmail lists newest first, so the listing pages through the whole backlog
+    (ids only, cheap) but keeps just the oldest MAX_SCAN ids in memory.
+    """
+    from gmails_tools import list_message_ids
+    # after: has one-second resolution, so messages are re-checked in milliseconds
+    query = " ".join(filter(None, [query, f"after:{cursor // 1000}"]))
+    oldest = deque(list_message_ids(query=query, service=service), maxlen=MAX_SCAN)
+    oldest.reverse()
+    return oldest
+
+class Account:
+    # The Gmail client is imported on first use, so loading accounts works without it (e.g. for mail imports)
+    def __init__(self, name, token_path=None, addresses=None, max_per_poll=None, daily_quota=None, query=None):
+        self.name = name
+        self.token_path = token_path
+        self.addresses = [a.lower() for a in (addresses or [])]
+        self.max_per_poll = max_per_poll
+        self.daily_quota = daily_quota
+        self.query = query
+        # Ids listed after the cursor but not downloaded yet, oldest first; kept between polls so a
+        # long backlog is listed once per MAX_SCAN messages rather than on every poll
+        self.backlog = deque()
+        self._service = None
+        self._lock = threading.Lock()
+
+    def service(self):
+        # Gmail client objects are not thread-safe, so each account gets its own, used by one poll thread at a time
+        with self._lock:
+            if self._service is None:
+                from gmails_tools import TOKEN_PATH, get_service
+                self._service = get_service(self.token_path or TOKEN_PATH)
+            return self._service
+
+    def self_addresses(self):
+        if not self.addresses:
+            from gmails_tools import get_profile_address
+            self.addresses = [get_profile_address(self.service()).lower()]
+        return self.addresses
+
+    def send_reply(self, to, subject, body):
+        from gmails_tools import send_reply
+        send_reply(to, subject, body, service=self.service())
+
+def load_accounts(path=None):
+    """Configured accounts, or the single default account when no accounts file exists."""
+    path = path or ACCOUNTS_PATH
+    if not os.path.exists(path):
+        support_email = os.environ.get("SUPPORT_EMAIL")
+        return [Account(DEFAULT_ACCOUNT, addresses=[support_email] if support_email else None)]
+    with open(path) as f:
+        config = json.load(f)
+    accounts = [Account(**entry) for entry in config.get("accounts", [])]
+    if not accounts:
+        raise ValueError(f"No accounts configured in {path}")
+    return accounts
+
+def find_account(accounts, name):
+    """The named account; emails stored before multi-account mode belong to the first one."""
+    return next((a for a in accounts if a.name == name), accounts[0])
+
+def poll_account(account, processor, responder, db, lock, max_per_poll=DEFAULT_MAX_PER_POLL, log=print):
+    """Fetch new mail for one account and process it; returns the process_new_emails counts."""
+    with lock:
+        state = db.account_state(account.name)
+    budget = account.max_per_poll or max_per_poll
+    if account.daily_quota is not None:
+        budget = min(budget, account.daily_quota - state["quota_used"])
+    totals = {"processed": 0, "sent": 0, "deduplicated": 0}
+    if budget <= 0:
+        metrics.inc("account_polls_total", account=account.name, outcome="quota")
+        log(f"[{account.name}] daily quota of {account.daily_quota} emails reached")
+        return totals
+
+    from gmails_tools import fetch_message, list_message_ids
+    cursor = state["cursor"]
+    service = account.service()
+    if not cursor:
+        # First poll: start from the newest `budget` messages
+        ids = deque(reversed(list(list_message_ids(limit=budget, query=account.query, service=service))))
+    else:
+        if not account.backlog:
+            account.backlog = _list_after(service, cursor, account.query)
+        ids = account.backlog
+    addresses = account.self_addresses()
+
+    def process(batch):
+        with lock:
+            counts = process_new_emails(batch, processor, responder, db, addresses, reply=account.send_reply, log=log)
+            for key in totals:
+                totals[key] += counts[key]
+            db.record_poll(account.name, addresses[0] if addresses else "",
+                           cursor=batch[-1]["internal_date"], processed=counts["processed"])
+
+    # Downloaded oldest first and processed a batch at a time as it fills, so the cursor never moves past
+    # mail still waiting for quota and analysis starts before the whole poll is downloaded
+    batch, fetched, scanned_to = [], 0, cursor
+    try:
+        for _ in range(MAX_SCAN):
+            if not ids or fetched >= budget:
+                break
+            email = fetch_message(ids.popleft(), service)
+            if cursor and email["internal_date"] <= cursor:
+                continue
+            scanned_to = max(scanned_to or 0, email["internal_date"])
+            if not is_support_subject(email["subject"]):
+                continue
+            metrics.inc("emails_fetched_total")
+            email["account"] = account.name
+            batch.append(email)
+            fetched += 1
+            if len(batch) == PROCESS_BATCH:
+                process(batch)
+                batch = []
+        if batch:
+            process(batch)
+    except Exception:
+        # The cursor has not moved past the ids already taken; list again from it on the next poll
+        account.backlog.clear()
+        raise
+    with lock:
+        # Past any non-support messages examined after the last processed one
+        db.record_poll(account.name, addresses[0] if addresses else "", cursor=scanned_to or cursor, processed=0)
+    metrics.inc("account_polls_total", account=account.name, outcome="ok")
+    return totals
+
+def poll_accounts(accounts, processor, responder, db, max_per_poll=DEFAULT_MAX_PER_POLL, log=print):
+    """Poll every account concurrently; returns {account name: counts or {"error": message}}."""
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=len(accounts), thread_name_prefix="poll") as pool:
+        futures = {a.name: pool.submit(poll_account, a, processor, responder, db, lock, max_per_poll, log)
+                   for a in accounts}
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            log(f"[{name}] poll failed: {e}")
+            metrics.inc("account_polls_total", account=name, outcome="error")
+            with lock:
+                db.record_poll_error(name, str(e))
+            results[name] = {"error": str(e)}
+    return results
@@ -0,0 +1,158 @@
+# src/archive.py
+"""Cold storage for handled emails (python main.py archive / search-archive / restore).
+
+Resolved and Replied emails older than the retention age move from the hot
+`emails` table to db/archive.db, with body and draft zlib-compressed. A
+contentless FTS5 index keeps the archive searchable without storing the text
+twice. The hot database keeps a tombstone per archived id so a re-fetched
+message is not processed again, and the analytics rollups keep counting
+archived emails.
+"""
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta, timezone
+import metrics
+
+ARCHIVE_PATH = "db/archive.db"
+RETENTION_DAYS = 30
+ARCHIVE_STATUSES = ("Resolved", "Replied")
+
+# Columns copied verbatim between the hot and archive tables (body and draft are handled separately)
+COLUMNS = ["id", "sender", "subject", "date", "sentiment", "priority_label", "priority_score", "extracted",
+           "summary", "status", "is_frustrated", "contact_info", "requirements", "received_at", "thread_id",
+           "duplicate_of", "account", "draft_source", "llm_drafted_at", "attachments", "truncated"]
+
+def compress(text):
+    return zlib.compress(text.encode("utf-8"), 6) if text is not None else None
+
+def decompress(blob):
+    return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+class Archive:
+    def __init__(self, db_path=ARCHIVE_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        cur = self.conn.cursor()
+        cur.execute(f'''CREATE TABLE IF NOT EXISTS archived_emails (
+                        {", ".join(c + (" TEXT PRIMARY KEY" if c == "id" else "") for c in COLUMNS)},
+                        body BLOB,
+                        draft BLOB,
+                        archived_at TEXT)''')
+        # Archives created before a column joined COLUMNS get it added, like Database._ensure_columns
+        existing = {row[1] for row in cur.execute("PRAGMA table_info(archived_emails)").fetchall()}
+        for column in COLUMNS:
+            if column not in existing:
+                cur.execute(f"ALTER TABLE archived_emails ADD COLUMN {column}")
+        try:
+            # Contentless: only the index is stored, the text lives compressed in archived_emails
+            cur.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts
+                           USING fts5(sender, subject, body, content='')''')
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to sender/subject LIKE
+            self.fts = False
+        self.conn.commit()
+
+    def add(self, rows):
+        """Store hot rows (dicts with every COLUMNS key plus body and draft)."""
+        cur = self.conn.cursor()
+        archived_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        for row in rows:
+            cur.execute("SELECT rowid FROM archived_emails WHERE id=?", (row["id"],))
+            existing = cur.fetchone()
+            if existing and self.fts:
+                # A row copied by an interrupted run: drop its index entry before re-adding it
+                old = cur.execute("SELECT sender, subject, body FROM archived_emails WHERE rowid=?",
+                                  existing).fetchone()
+                cur.execute("INSERT INTO archive_fts (archive_fts, rowid, sender, subject, body) "
+                            "VALUES ('delete', ?, ?, ?, ?)", (existing[0], old[0], old[1], decompress(old[2])))
+            cur.execute(f'''INSERT OR REPLACE INTO archived_emails ({", ".join(COLUMNS)}, body, draft, archived_at)
+                            VALUES ({", ".join("?" for _ in COLUMNS)}, ?, ?, ?)''',
+                        [row[c] for c in COLUMNS] + [compress(row["body"]), compress(row["draft"]), archived_at])
+            if self.fts:
+                cur.execute("INSERT INTO archive_fts (rowid, sender, subject, body) VALUES (?, ?, ?, ?)",
+                            (cur.lastrowid, row["sender"], row["subject"], row["body"]))
+        self.conn.commit()
+
+    def search(self, query, limit=50):
+        """Archived emails matching `query` (FTS5 syntax when available), newest first, without bodies."""
+        cur = self.conn.cursor()
+        fields = "a.id, a.sender, a.subject, a.status, a.priority_label, a.received_at, a.archived_at"
+        if self.fts:
+            cur.execute(f'''SELECT {fields} FROM archive_fts f JOIN archived_emails a ON a.rowid = f.rowid
+                            WHERE archive_fts MATCH ? ORDER BY a.received_at DESC LIMIT ?''', (query, limit))
+        else:
+            pattern = f"%{query}%"
+            cur.execute(f'''SELECT {fields} FROM archived_emails a WHERE a.sender LIKE ? OR a.subject LIKE ?
+                            ORDER BY a.received_at DESC LIMIT ?''', (pattern, pattern, limit))
+        names = ["id", "sender", "subject", "status", "priority_label", "received_at", "archived_at"]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def get(self, email_id):
+        """Full archived email with body and draft decompressed, or None."""
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {', '.join(COLUMNS)}, body, draft FROM archived_emails WHERE id=?", (email_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        email = dict(zip(COLUMNS + ["body", "draft"], row))
+        email["body"] = decompress(email["body"])
+        email["draft"] = decompress(email["draft"])
+        return email
+
+    def remove(self, email_id):
+        cur = self.conn.cursor()
+        cur.execute("SELECT rowid, sender, subject, body FROM archived_emails WHERE id=?", (email_id,))
+        row = cur.fetchone()
+        if row is None:
+            return
+        if self.fts:
+            cur.execute("INSERT INTO archive_fts (archive_fts, rowid, sender, subject, body) "
+                        "VALUES ('delete', ?, ?, ?, ?)", (row[0], row[1], row[2], decompress(row[3])))
+        cur.execute("DELETE FROM archived_emails WHERE rowid=?", (row[0],))
+        self.conn.commit()
+
+    def stats(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body) + COALESCE(LENGTH(draft), 0)), 0) FROM archived_emails")
+        count, stored_bytes = cur.fetchone()
+        return {"emails": count, "compressed_bytes": stored_bytes}
+
+def archive_old_emails(db, archive, older_than_days=RETENTION_DAYS, statuses=ARCHIVE_STATUSES, batch_size=500,
+                       vacuum=False, log=print):
+    """Move handled emails older than `older_than_days` from the hot database into the archive."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    moved = raw_bytes = 0
+    with metrics.timed("archive"):
+        while True:
+            rows = db.archivable(cutoff, statuses, COLUMNS + ["body", "draft"], batch_size)
+            if not rows:
+                break
+            # Archive first: a crash in between leaves a row in both places, never in neither
+            archive.add(rows)
+            db.remove_archived([(row["id"], row["status"]) for row in rows])
+            moved += len(rows)
+            raw_bytes += sum(len((row["body"] or "").encode("utf-8")) + len((row["draft"] or "").encode("utf-8"))
+                             for row in rows)
+            log(f"Archived {moved} emails")
+    metrics.inc("emails_archived_total", moved)
+    # Cached analyses age out with the same retention; stale processor versions are never hit again
+    pruned = db.prune_analysis_cache(older_than_days)
+    if vacuum and (moved or pruned):
+        db.vacuum()
+    return {"archived": moved, "raw_bytes": raw_bytes, "cutoff": cutoff, "analyses_pruned": pruned}
+
+def restore_email(db, archive, email_id):
+    """Move one email back from the archive into the hot table; returns False if it is not archived."""
+    email = archive.get(email_id)
+    if email is None:
+        return False
+    db.restore_archived(email)
+    archive.remove(email_id)
+    metrics.inc("emails_restored_total")
+    return True
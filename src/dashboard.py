@@ -11,109 +11,139 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-from gmails_tools import fetch_support_emails, send_reply
 from email_processor import EmailProcessor
 from response_generator import ResponseGenerator
-from database import Database
+from rag_system import RAGSystem
+from database import SharedDatabase
+from job_queue import JobQueue
+from archive import Archive, restore_email, ARCHIVE_PATH
+from worker import extract_email, upgrade_drafts
+from accounts import load_accounts, poll_accounts, find_account
+import metrics
 
 DB_PATH = "db/emails.db"
+JOBS_DB_PATH = "db/jobs.db"
 
 st.set_page_config(layout="wide", page_title="AI Email Assistant")
 
+# Heavy objects live for the whole server process instead of one rerun
+@st.cache_resource
+def get_rag_system():
+    return RAGSystem()
+
+@st.cache_resource
+def get_processor():
+    return EmailProcessor(rag_system=get_rag_system(), cache=get_db())
+
+@st.cache_resource
+def get_responder():
+    return ResponseGenerator(rag_system=get_rag_system())
+
+@st.cache_resource
+def get_db():
+    # One connection for every session and poll thread, so calls are serialised
+    return SharedDatabase(DB_PATH)
+
+@st.cache_resource
+def get_queue():
+    return JobQueue(JOBS_DB_PATH)
+
+@st.cache_resource
+def get_accounts():
+    return load_accounts()
+
+def own_addresses():
+    # Configured addresses plus those learned from Gmail profiles during polls
+    addresses = {a for account in get_accounts() for a in account.addresses}
+    addresses.update(row["address"].lower() for row in get_db().list_accounts() if row["address"])
+    return addresses
+
+@st.cache_resource
+def get_archive():
+    return Archive(ARCHIVE_PATH)
+
+def worker_online():
+    # With a background worker running, heavy work is queued instead of run in this process
+    return bool(get_queue().active_workers())
+
 st.title("📩 AI-Powered Communication Assistant")
 
-# Add auto-refresh option
-if st.checkbox("🔄 Auto-refresh every 30 seconds"):
-    import time
-    time.sleep(30)
-    st.rerun()
+# Live updates: one small fragment polls the cheap change markers and reruns the page only when they move
+LIVE_REFRESH_SECONDS = 10
+live_updates = st.checkbox(f"🔄 Live updates (checks for changes every {LIVE_REFRESH_SECONDS} seconds)")
+
+def page_token():
+    # Emails (PRAGMA data_version), the hour behind "Last 24 Hours" and the state of recent jobs
+    jobs = tuple((job["id"], job["status"]) for job in get_queue().recent_jobs(10))
+    return get_db().change_token(), pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d %H"), jobs
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS if live_updates else None)
+def watch_changes():
+    if page_token() != st.session_state.get("rendered_token"):
+        st.rerun()
+
+st.session_state["rendered_token"] = page_token()
+watch_changes()
 
 # Add action buttons at the top
 col1, col2, col3 = st.columns([2, 2, 1])
 
 with col1:
     if st.button("🔄 Fetch & Process New Emails", type="primary"):
-        with st.spinner("Processing emails..."):
-            try:
-                # Fetch emails
-                emails = fetch_support_emails(max_results=10)
-                if emails:
-                    processor = EmailProcessor()
-                    responder = ResponseGenerator()
-                    db = Database()
-                    my_email = "idf6877@gmail.com"
+        if worker_online():
+            job_id = get_queue().enqueue("fetch", {"max_results": 10}, priority=50, dedupe_key="fetch")
+            st.success(f"⏳ Fetch queued as job #{job_id} for the background worker.")
+        else:
+            with st.spinner("Processing emails..."):
+                try:
+                    # Fetch every mailbox concurrently
+                    results = poll_accounts(get_accounts(), get_processor(), get_responder(), get_db(),
+                                            log=lambda msg: None)
+                    for name, error in ((n, c["error"]) for n, c in results.items() if "error" in c):
+                        st.error(f"Error fetching {name}: {error}")
+                    counts = [c for c in results.values() if "error" not in c]
+                    if any(c["processed"] or c["deduplicated"] for c in counts):
+                        st.success(f"✅ Processed {sum(c['processed'] for c in counts)} new emails, "
+                                   f"sent {sum(c['sent'] for c in counts)} urgent replies, "
+                                   f"{sum(c['deduplicated'] for c in counts)} grouped with their thread or a duplicate!")
+                        st.rerun()
+                    elif counts:
+                        st.info("No new support emails found.")
+                except Exception as e:
+                    st.error(f"Error processing emails: {str(e)}")
+
+with col2:
+    if st.button("📧 Send All Pending Replies"):
+        if worker_online():
+            job_id = get_queue().enqueue("send_pending", priority=20, dedupe_key="send_pending")
+            st.success(f"⏳ Sending queued as job #{job_id} for the background worker.")
+        else:
+            with st.spinner("Sending replies..."):
+                try:
+                    db = get_db()
+                    with db.lock:
+                        pending_emails = pd.read_sql_query(
+                            "SELECT * FROM emails WHERE status='Pending'", db.conn
+                        )
                     
-                    processed_count = 0
                     sent_count = 0
-                    
-                    for email in emails:
-                        if db.is_replied(email["id"]):
-                            continue
-                        
-                        # Extract email from sender field
-                        import re
-                        match = re.search(r'<(.+?)>', email["sender"])
-                        sender_email = (match.group(1) if match else email["sender"]).lower()
-                        if sender_email == my_email.lower():
-                            continue
-                            
-                        processed = processor.process_email(email)
-                        draft = responder.generate_response(email, processed)
-                        db.save_email(email, processed, draft)
-                        processed_count += 1
+                    for _, row in pending_emails.iterrows():
+                        find_account(get_accounts(), row["account"]).send_reply(row["sender"], row["subject"], row["draft"])
                         
-                        # Send reply for urgent emails
-                        if processed["priority_label"] == "Urgent":
-                            send_reply(email["sender"], email["subject"], draft)
-                            cur = db.conn.cursor()
-                            cur.execute("UPDATE emails SET status='Replied' WHERE id=?", (email["id"],))
-                            db.conn.commit()
-                            sent_count += 1
+                        # Update status
+                        db.update_status(row["id"], "Replied")
+                        sent_count += 1
                     
-                    st.success(f"✅ Processed {processed_count} new emails, sent {sent_count} urgent replies!")
+                    st.success(f"✅ Sent {sent_count} replies!")
                     st.rerun()
-                else:
-                    st.info("No new support emails found.")
-            except Exception as e:
-                st.error(f"Error processing emails: {str(e)}")
-
-with col2:
-    if st.button("📧 Send All Pending Replies"):
-        with st.spinner("Sending replies..."):
-            try:
-                db = Database()
-                conn = sqlite3.connect(DB_PATH)
-                pending_emails = pd.read_sql_query(
-                    "SELECT * FROM emails WHERE status='Pending'", conn
-                )
-                conn.close()
-                
-                sent_count = 0
-                for _, row in pending_emails.iterrows():
-                    send_reply(row["sender"], row["subject"], row["draft"])
-                    
-                    # Update status
-                    conn = sqlite3.connect(DB_PATH)
-                    cur = conn.cursor()
-                    cur.execute("UPDATE emails SET status='Replied' WHERE id=?", (row["id"],))
-                    conn.commit()
-                    conn.close()
-                    sent_count += 1
-                
-                st.success(f"✅ Sent {sent_count} replies!")
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error sending replies: {str(e)}")
+                except Exception as e:
+                    st.error(f"Error sending replies: {str(e)}")
 
 with col3:
     if st.button("🗑️ Clear All"):
         if st.session_state.get('confirm_clear', False):
             try:
-                conn = sqlite3.connect(DB_PATH)
-                cur = conn.cursor()
-                cur.execute("DELETE FROM emails")
-                conn.commit()
-                conn.close()
+                get_db().clear()
                 st.success("✅ All emails cleared!")
                 st.rerun()
             except Exception as e:
@@ -122,7 +152,61 @@ with col3:
             st.session_state['confirm_clear'] = True
             st.warning("Click again to confirm clearing all emails")
 
-def load_df():
+def job_status():
+    workers = get_queue().active_workers()
+    jobs = get_queue().recent_jobs(10)
+    if not workers and not jobs:
+        return
+    with st.expander(f"⚙️ Background jobs — {len(workers)} worker(s) online", expanded=False):
+        if jobs:
+            jobs_df = pd.DataFrame(jobs)
+            for col in ("created_at", "updated_at"):
+                jobs_df[col] = pd.to_datetime(jobs_df[col], unit="s", utc=True)
+            st.dataframe(jobs_df[["id", "kind", "status", "attempts", "error", "created_at", "updated_at"]],
+                         use_container_width=True)
+        else:
+            st.write("No jobs yet.")
+
+job_status()
+
+def render_metrics(snapshot):
+    stages = [{"stage": h["labels"].get("stage", h["name"]), "count": h["count"],
+               "avg ms": round(h["avg_ms"], 2), "p95 ms (bucket)": h["p95_ms"]}
+              for h in snapshot["histograms"]]
+    if stages:
+        st.dataframe(pd.DataFrame(stages), use_container_width=True, hide_index=True)
+    counters = [{"metric": c["name"], "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()),
+                 "value": c["value"]} for c in snapshot["counters"]]
+    if counters:
+        st.dataframe(pd.DataFrame(counters), use_container_width=True, hide_index=True)
+    for cache, rate in snapshot["cache_hit_rates"].items():
+        st.write(f"Cache hit rate — {cache}: {rate:.0%}")
+    if snapshot["traces"]:
+        st.write("**Recent traces**")
+        st.json(snapshot["traces"], expanded=False)
+    if not (stages or counters):
+        st.write("No activity recorded yet.")
+
+def system_health():
+    with st.expander("🩺 System health", expanded=False):
+        accounts = get_db().list_accounts()
+        if accounts:
+            st.markdown("**Mailboxes**")
+            st.dataframe(pd.DataFrame(accounts)[["name", "address", "quota_used", "last_poll_at", "last_error"]],
+                         use_container_width=True, hide_index=True)
+        for worker in get_queue().active_workers():
+            info = json.loads(worker["info"] or "{}")
+            if "metrics" in info:
+                st.markdown(f"**Worker {worker['worker_id']}**")
+                render_metrics(info["metrics"])
+        st.markdown("**Dashboard process**")
+        render_metrics(metrics.REGISTRY.snapshot())
+
+system_health()
+
+@st.cache_data(max_entries=4)
+def load_df(change_token):
+    # change_token is only the cache key: the table is reread when it changes
     conn = sqlite3.connect(DB_PATH)
     try:
         df = pd.read_sql_query("SELECT * FROM emails", conn)
@@ -131,99 +215,96 @@ def load_df():
     conn.close()
     return df
 
-df = load_df()
+@st.cache_data(max_entries=4)
+def load_analytics(change_token, hour):
+    # Served from the rollup tables, so cost does not grow with the number of emails.
+    # `hour` keeps "Last 24 Hours" moving forward while the data itself is unchanged.
+    db = get_db()
+    stats = db.analytics_summary()
+    stats["daily"] = db.daily_counts()
+    stats["top_senders"] = db.top_senders(5)
+    return stats
 
 # Filter out self emails from display
-MY_EMAIL = "idf6877@gmail.com"
-import re
-def extract_email(sender):
-    match = re.search(r'<(.+?)>', str(sender))
-    if match:
-        return match.group(1)
-    return str(sender).strip()
+def current_emails():
+    df = load_df(get_db().change_token())
+    if not df.empty:
+        own = own_addresses()
+        df = df[df["sender"].apply(lambda x: extract_email(x).lower() not in own)]
+    return df
 
-if not df.empty:
-    df = df[df["sender"].apply(lambda x: extract_email(x).lower() != MY_EMAIL.lower())]
+def current_hour():
+    return pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d %H")
 
-if df.empty:
-    st.info("No emails yet. Run main.py to ingest/process emails.")
-else:
-    # --- Email List with Filtering ---
-    st.subheader("Email List")
-    search = st.text_input("Search by sender, subject, or status")
-    filtered_df = df[df.apply(lambda x: search.lower() in str(x["sender"]).lower() or search.lower() in str(x["subject"]).lower() or search.lower() in str(x["status"]).lower(), axis=1)] if search else df
-    st.dataframe(filtered_df[["id","sender","subject","sentiment","priority_label","status"]], use_container_width=True)
+def search_filter(df, search):
+    return df[df.apply(lambda x: search.lower() in str(x["sender"]).lower() or search.lower() in str(x["subject"]).lower() or search.lower() in str(x["status"]).lower(), axis=1)] if search else df
 
-    # --- Analytics Section ---
-    st.subheader("📊 Advanced Analytics")
+def email_list(search):
+    df = current_emails()
+    if df.empty:
+        st.info("No emails yet. Run main.py to ingest/process emails.")
+    else:
+        filtered_df = search_filter(df, search)
+        st.dataframe(filtered_df[["id","account","sender","subject","sentiment","priority_label","status"]], use_container_width=True)
+
+def summary_counters():
+    stats = load_analytics(get_db().change_token(), current_hour())
+    by_status = stats["by_status"]
     
     # Summary Statistics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Emails", len(df))
+        st.metric("Total Emails", stats["total"])
     
     with col2:
-        try:
-            df_copy = df.copy()
-            df_copy["date_parsed"] = pd.to_datetime(df_copy["date"], errors="coerce", utc=True)
-            cutoff_time = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=1)
-            last_24h = df_copy[df_copy["date_parsed"] > cutoff_time]
-            st.metric("Last 24 Hours", len(last_24h))
-        except Exception:
-            st.metric("Last 24 Hours", "N/A")
+        st.metric("Last 24 Hours", stats["last_24h"])
     
     with col3:
-        resolved_count = len(df[df["status"] == "Resolved"])
-        st.metric("Resolved", resolved_count)
+        st.metric("Resolved", by_status.get("Resolved", 0))
     
     with col4:
-        pending_count = len(df[df["status"] == "Pending"])
-        st.metric("Pending", pending_count)
+        st.metric("Pending", by_status.get("Pending", 0))
+
+def analytics_charts():
+    stats = load_analytics(get_db().change_token(), current_hour())
+    total = stats["total"]
+    by_status = stats["by_status"]
     
     # Charts
     col1, col2, col3 = st.columns(3)
     with col1:
         st.write("Sentiment Distribution")
-        if len(df) > 0:
-            fig = px.pie(df, names="sentiment", title="Sentiment Analysis")
+        if total > 0:
+            sentiments = stats["by_sentiment"]
+            fig = px.pie(names=list(sentiments.keys()), values=list(sentiments.values()), title="Sentiment Analysis")
             st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.write("Priority Distribution")
-        if len(df) > 0:
-            fig = px.pie(df, names="priority_label", title="Priority Levels", 
+        if total > 0:
+            priorities = stats["by_priority"]
+            fig = px.pie(names=list(priorities.keys()), values=list(priorities.values()), title="Priority Levels", 
                         color_discrete_map={"Urgent": "red", "Not urgent": "blue"})
             st.plotly_chart(fig, use_container_width=True)
     
     with col3:
         st.write("Status Overview")
-        if len(df) > 0:
-            status_counts = df["status"].value_counts()
-            fig = px.bar(x=status_counts.index, y=status_counts.values, 
-                        title="Email Status", color=status_counts.values,
+        if total > 0:
+            fig = px.bar(x=list(by_status.keys()), y=list(by_status.values()), 
+                        title="Email Status", color=list(by_status.values()),
                         color_continuous_scale="Viridis")
             st.plotly_chart(fig, use_container_width=True)
     
     # Time series chart
     st.subheader("📈 Email Trends")
-    if "date" in df.columns and len(df) > 0:
-        try:
-            df_copy = df.copy()
-            df_copy["date_parsed"] = pd.to_datetime(df_copy["date"], errors="coerce", utc=True)
-            valid_dates = df_copy.dropna(subset=["date_parsed"])
-            if not valid_dates.empty:
-                valid_dates = valid_dates.copy()
-                # Convert to local timezone for display
-                valid_dates["date_only"] = valid_dates["date_parsed"].dt.tz_convert(None).dt.date
-                time_df = valid_dates.groupby("date_only").size().reset_index(name="count")
-                fig = px.line(time_df, x="date_only", y="count", title="Emails Received Over Time",
-                             markers=True)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No valid dates to plot timeline.")
-        except Exception as e:
-            st.info(f"Unable to generate timeline chart: {str(e)}")
+    if stats["daily"]:
+        time_df = pd.DataFrame(stats["daily"], columns=["date_only", "count"])
+        fig = px.line(time_df, x="date_only", y="count", title="Emails Received Over Time",
+                     markers=True)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No valid dates to plot timeline.")
     
     # Detailed breakdown
     st.subheader("🔍 Detailed Breakdown")
@@ -231,21 +312,35 @@ else:
     
     with col1:
         st.write("**Top Senders**")
-        if len(df) > 0:
-            sender_counts = df["sender"].value_counts().head(5)
+        if stats["top_senders"]:
+            sender_counts = pd.DataFrame(stats["top_senders"], columns=["sender", "count"]).set_index("sender")
             st.dataframe(sender_counts, use_container_width=True)
     
     with col2:
         st.write("**Response Rate**")
-        if len(df) > 0:
-            total = len(df)
-            replied = len(df[df["status"] == "Replied"])
+        if total > 0:
+            replied = by_status.get("Replied", 0)
             response_rate = (replied / total * 100) if total > 0 else 0
             
             fig = px.pie(values=[replied, total-replied], names=["Replied", "Not Replied"],
                         title=f"Response Rate: {response_rate:.1f}%")
             st.plotly_chart(fig, use_container_width=True)
 
+df = current_emails()
+
+# --- Email List with Filtering ---
+st.subheader("Email List")
+search = st.text_input("Search by sender, subject, or status")
+email_list(search)
+
+if not df.empty:
+    filtered_df = search_filter(df, search)
+
+    # --- Analytics Section ---
+    st.subheader("📊 Advanced Analytics")
+    summary_counters()
+    analytics_charts()
+
     # --- Details & Drafts ---
     st.subheader("📧 Email Details & AI Responses")
     for _, row in filtered_df.iterrows():
@@ -263,11 +358,19 @@ else:
                 st.markdown(f"**⚡ Priority:** {row['priority_label']}")
             
             # Status badge
-            status_emoji = {"Pending": "⏳", "Replied": "✅", "Resolved": "🎯"}.get(row["status"], "❓")
+            status_emoji = {"Pending": "⏳", "Replied": "✅", "Resolved": "🎯", "Superseded": "🔁"}.get(row["status"], "❓")
             st.markdown(f"**{status_emoji} Status:** {row['status']}")
+            if row.get("duplicate_of"):
+                st.caption(f"Grouped with email {row['duplicate_of']}; analysis and draft reused from it.")
             
             # Email body with styling
             st.markdown(f"<div style='background-color:{urgency_color};padding:15px;border-radius:5px;margin:10px 0'><b>📄 Email Body:</b><br>{row['body']}</div>", unsafe_allow_html=True)
+            if row.get("truncated") == 1:
+                st.caption("✂️ Body cut at 256 KB; the full message is in the mailbox.")
+            if isinstance(row.get("attachments"), str):
+                attachments = json.loads(row["attachments"])
+                st.markdown("**📎 Attachments:** " + ", ".join(
+                    f"{a['filename'] or a['mimeType']} ({a['size'] / 1024:.0f} KB)" for a in attachments))
             
             # Extracted information
             try:
@@ -306,7 +409,10 @@ else:
                 st.write("**📊 Extracted Data:** Could not parse extraction data")
             
             # AI-generated response
-            st.markdown("**🤖 AI-Generated Response:**")
+            if row.get("draft_source") == "template":
+                st.markdown("**📝 Template Response** (AI draft not generated yet):")
+            else:
+                st.markdown("**🤖 AI-Generated Response:**")
             draft = st.text_area("Edit draft reply", value=row["draft"], height=200, key=f"draft_{row['id']}")
             
             # Action buttons
@@ -316,49 +422,83 @@ else:
                 st.success("Draft content copied! (Feature placeholder)")
             
             if cols[1].button("📧 Send Reply", key=f"send_{row['id']}"):
-                try:
-                    send_reply(row["sender"], row["subject"], draft)
-                    conn = sqlite3.connect(DB_PATH)
-                    cur = conn.cursor()
-                    cur.execute("UPDATE emails SET status='Replied' WHERE id=?", (row["id"],))
-                    conn.commit()
-                    conn.close()
-                    st.success("✅ Reply sent successfully!")
-                    st.experimental_rerun()
-                except Exception as e:
-                    st.error(f"Error sending reply: {str(e)}")
+                if worker_online():
+                    job_id = get_queue().enqueue("send", {"email_id": row["id"], "draft": draft}, priority=10,
+                                                 dedupe_key=f"send:{row['id']}")
+                    st.success(f"⏳ Reply queued as job #{job_id}.")
+                else:
+                    try:
+                        find_account(get_accounts(), row["account"]).send_reply(row["sender"], row["subject"], draft)
+                        get_db().update_status(row["id"], "Replied")
+                        st.success("✅ Reply sent successfully!")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Error sending reply: {str(e)}")
             
             if cols[2].button("✅ Mark Resolved", key=f"resolve_{row['id']}"):
-                conn = sqlite3.connect(DB_PATH)
-                cur = conn.cursor()
-                cur.execute("UPDATE emails SET status=? WHERE id=?", ("Resolved", row["id"]))
-                conn.commit()
-                conn.close()
+                get_db().update_status(row["id"], "Resolved")
                 st.success("✅ Marked as resolved! Please refresh the page.")
                 st.rerun()
             
             if cols[3].button("🔄 Regenerate", key=f"regen_{row['id']}"):
-                try:
-                    processor = EmailProcessor()
-                    responder = ResponseGenerator()
-                    email_data = {
-                        "id": row["id"],
-                        "sender": row["sender"],
-                        "subject": row["subject"],
-                        "body": row["body"]
-                    }
-                    processed = processor.process_email(email_data)
-                    new_draft = responder.generate_response(email_data, processed)
+                if worker_online():
+                    job_id = get_queue().enqueue("regenerate", {"email_id": row["id"]}, priority=20,
+                                                 dedupe_key=f"regenerate:{row['id']}")
+                    st.success(f"⏳ Regeneration queued as job #{job_id}.")
+                else:
+                    try:
+                        processor = get_processor()
+                        responder = get_responder()
+                        email_data = {
+                            "id": row["id"],
+                            "sender": row["sender"],
+                            "subject": row["subject"],
+                            "body": row["body"]
+                        }
+                        processed = processor.process_email(email_data)
+                        new_draft, draft_source = responder.generate_draft(email_data, processed)
                     
-                    conn = sqlite3.connect(DB_PATH)
-                    cur = conn.cursor()
-                    cur.execute("UPDATE emails SET draft=? WHERE id=?", (new_draft, row["id"]))
-                    conn.commit()
-                    conn.close()
-                    st.success("🔄 Response regenerated!")
-                    st.experimental_rerun()
-                except Exception as e:
-                    st.error(f"Error regenerating response: {str(e)}")
+                        get_db().update_draft(row["id"], new_draft, draft_source)
+                        st.success("🔄 Response regenerated!")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Error regenerating response: {str(e)}")
+            
+            if row.get("draft_source") == "template" and row["status"] == "Pending" \
+                    and cols[4].button("✨ Generate AI Draft", key=f"upgrade_{row['id']}"):
+                if worker_online():
+                    job_id = get_queue().enqueue("upgrade_drafts", {"email_id": row["id"]}, priority=15,
+                                                 dedupe_key=f"upgrade:{row['id']}")
+                    st.success(f"⏳ AI draft queued as job #{job_id}.")
+                else:
+                    result = upgrade_drafts(get_responder(), get_db(), email_id=row["id"], log=lambda msg: None)
+                    if result["upgraded"]:
+                        st.success("✨ AI draft generated!")
+                        st.rerun()
+                    else:
+                        st.error("The AI model is unavailable; the template draft was kept.")
             
             # Show confidence score or additional metrics
             st.markdown(f"<div style='background-color:#f0f0f0;padding:10px;border-radius:5px;margin-top:10px'><small>💯 Priority Score: {row.get('priority_score', 'N/A')} | 📊 Confidence: High | 🎯 Auto-processed: Yes</small></div>", unsafe_allow_html=True)
+
+# --- Archive (cold storage, see archive.py) ---
+with st.expander("🗄️ Archived emails"):
+    stats = get_archive().stats()
+    st.caption(f"{stats['emails']} archived emails, {stats['compressed_bytes'] / 1024:.1f} KB compressed. "
+               f"Move old handled emails here with `python main.py archive`.")
+    archive_query = st.text_input("Search archive (sender, subject or body)", key="archive_query")
+    if archive_query:
+        try:
+            matches = get_archive().search(archive_query)
+        except sqlite3.OperationalError as e:
+            st.error(f"Invalid search: {e}")
+            matches = []
+        if matches:
+            st.dataframe(pd.DataFrame(matches), use_container_width=True)
+            restore_id = st.selectbox("Email to restore", [m["id"] for m in matches], key="restore_id")
+            if st.button("♻️ Restore to inbox", key="restore_button"):
+                restore_email(get_db(), get_archive(), restore_id)
+                st.success(f"✅ Restored {restore_id}.")
+                st.rerun()
+        else:
+            st.info("No archived emails match.")
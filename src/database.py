@@ -2,6 +2,33 @@
 import sqlite3
 import os
 import json
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+import metrics
+
+def parse_received_at(date_header):
+    """Normalise an RFC 2822 Date header to a sortable UTC string ('' if unparseable)."""
+    if not date_header:
+        return ""
+    try:
+        dt = parsedate_to_datetime(date_header)
+    except Exception:
+        return ""
+    if dt is None:
+        return ""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def _hour_bucket(received_at):
+    # 'YYYY-MM-DD HH' keeps the rollup small while still answering "last 24 hours"
+    return received_at[:13] if received_at else ""
+
+def _attachment_fields(email):
+    # Attachment metadata (JSON list) and the body-cut flag set by the Gmail and mailbox parsers
+    attachments = email.get("attachments")
+    return json.dumps(attachments) if attachments else None, int(bool(email.get("truncated")))
 
 class Database:
     def __init__(self, db_path="db/emails.db"):
@@ -28,6 +55,115 @@ class Database:
                         is_frustrated BOOLEAN DEFAULT 0,
                         contact_info TEXT,
                         requirements TEXT)''')
+        # Analytics rollups, maintained on every write so the dashboard never scans emails.
+        # They count every stored row, including mail from our own addresses that the email list hides;
+        # process_new_emails skips such mail at ingest, so only rows stored before that filter differ.
+        cur.execute('''CREATE TABLE IF NOT EXISTS email_rollup (
+                        bucket TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        priority_label TEXT NOT NULL,
+                        sentiment TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (bucket, status, priority_label, sentiment))''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS sender_rollup (
+                        sender TEXT PRIMARY KEY,
+                        count INTEGER NOT NULL)''')
+        # MinHash LSH buckets of processed emails, for near-duplicate lookups (see dedup.py)
+        cur.execute('''CREATE TABLE IF NOT EXISTS signature_bands (
+                        band INTEGER NOT NULL,
+                        bucket TEXT NOT NULL,
+                        email_id TEXT NOT NULL,
+                        PRIMARY KEY (band, bucket, email_id))''')
+        # Ids moved to the archive database (see archive.py), so re-fetched messages are not reprocessed
+        cur.execute('''CREATE TABLE IF NOT EXISTS archived_ids (
+                        id TEXT PRIMARY KEY,
+                        status TEXT)''')
+        # Per-mailbox sync state (see accounts.py): cursor is the newest Gmail internalDate processed
+        cur.execute('''CREATE TABLE IF NOT EXISTS accounts (
+                        name TEXT PRIMARY KEY,
+                        address TEXT,
+                        cursor INTEGER,
+                        quota_day TEXT,
+                        quota_used INTEGER NOT NULL DEFAULT 0,
+                        last_poll_at TEXT,
+                        last_error TEXT)''')
+        # Resume positions of offline mailbox imports (see mail_import.py)
+        cur.execute('''CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                        source TEXT PRIMARY KEY,
+                        position INTEGER NOT NULL,
+                        updated_at TEXT NOT NULL)''')
+        # process_email results by content address (see email_processor.analysis_key)
+        cur.execute('''CREATE TABLE IF NOT EXISTS analysis_cache (
+                        key TEXT PRIMARY KEY,
+                        result TEXT NOT NULL,
+                        created_at TEXT NOT NULL)''')
+        self.conn.commit()
+        added = self._ensure_columns("emails", {"received_at": "TEXT", "thread_id": "TEXT",
+                                                "duplicate_of": "TEXT", "minhash": "BLOB", "account": "TEXT",
+                                                "draft_source": "TEXT", "llm_drafted_at": "TEXT",
+                                                "attachments": "TEXT", "truncated": "INTEGER"})
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_emails_thread ON emails (thread_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_emails_status_received ON emails (status, received_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_emails_account ON emails (account)")
+        self.conn.commit()
+        if "received_at" in added:
+            self._backfill_received_at()
+            self.rebuild_rollups()
+
+    def _ensure_columns(self, table, columns):
+        """Add any missing columns to an existing table; returns the names added."""
+        cur = self.conn.cursor()
+        cur.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cur.fetchall()}
+        added = []
+        for name, decl in columns.items():
+            if name not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+                added.append(name)
+        self.conn.commit()
+        return added
+
+    def _backfill_received_at(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, date FROM emails")
+        updates = [(parse_received_at(date), email_id) for email_id, date in cur.fetchall()]
+        cur.executemany("UPDATE emails SET received_at=? WHERE id=?", updates)
+        self.conn.commit()
+
+    def _rollup_key(self, row):
+        received_at, status, priority_label, sentiment, sender = row
+        return (_hour_bucket(received_at), status or "", priority_label or "", sentiment or ""), sender or ""
+
+    def _apply_rollup(self, cur, row, delta):
+        key, sender = self._rollup_key(row)
+        cur.execute('''INSERT INTO email_rollup (bucket, status, priority_label, sentiment, count)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(bucket, status, priority_label, sentiment)
+                       DO UPDATE SET count = count + excluded.count''', key + (delta,))
+        cur.execute('''INSERT INTO sender_rollup (sender, count) VALUES (?, ?)
+                       ON CONFLICT(sender) DO UPDATE SET count = count + excluded.count''',
+                    (sender, delta))
+        if delta < 0:
+            cur.execute('''DELETE FROM email_rollup WHERE bucket=? AND status=? AND priority_label=?
+                           AND sentiment=? AND count <= 0''', key)
+            cur.execute("DELETE FROM sender_rollup WHERE sender=? AND count <= 0", (sender,))
+
+    def _rollup_row(self, cur, email_id):
+        cur.execute("SELECT received_at, status, priority_label, sentiment, sender FROM emails WHERE id=?",
+                    (email_id,))
+        return cur.fetchone()
+
+    def rebuild_rollups(self):
+        """Recompute the rollup tables from scratch (used after migrations)."""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM email_rollup")
+        cur.execute("DELETE FROM sender_rollup")
+        cur.execute('''INSERT INTO email_rollup (bucket, status, priority_label, sentiment, count)
+                       SELECT COALESCE(substr(received_at, 1, 13), ''), COALESCE(status, ''),
+                              COALESCE(priority_label, ''), COALESCE(sentiment, ''), COUNT(*)
+                       FROM emails GROUP BY 1, 2, 3, 4''')
+        cur.execute('''INSERT INTO sender_rollup (sender, count)
+                       SELECT COALESCE(sender, ''), COUNT(*) FROM emails GROUP BY 1''')
         self.conn.commit()
 
     def is_replied(self, email_id):
@@ -36,12 +172,21 @@ class Database:
         row = cur.fetchone()
         return row is not None and row[0] == "Replied"
 
-    def save_email(self, email, processed, draft):
+    def is_archived(self, email_id):
+        cur = self.conn.cursor()
+        cur.execute("SELECT 1 FROM archived_ids WHERE id=?", (email_id,))
+        return cur.fetchone() is not None
+
+    def save_email(self, email, processed, draft, draft_source=None, duplicate_of=None):
+        with metrics.timed("db_write"):
+            self._save_email(email, processed, draft, draft_source, duplicate_of)
+
+    def _save_email(self, email, processed, draft, draft_source=None, duplicate_of=None):
         cur = self.conn.cursor()
         # If status is already Replied, keep it. Otherwise, set to Pending.
-        cur.execute("SELECT status FROM emails WHERE id=?", (email["id"],))
-        row = cur.fetchone()
-        status = row[0] if row and row[0] == "Replied" else "Pending"
+        old_row = self._rollup_row(cur, email["id"])
+        status = old_row[1] if old_row and old_row[1] == "Replied" else "Pending"
+        received_at = parse_received_at(email.get("date", ""))
         
         # Prepare additional fields
         is_frustrated = processed.get("is_frustrated", False)
@@ -49,16 +194,398 @@ class Database:
         requirements = json.dumps(processed.get("requirements", []))
         
         cur.execute('''INSERT OR REPLACE INTO emails
-                       (id, sender, subject, body, date, sentiment, priority_label, priority_score, extracted, summary, draft, status, is_frustrated, contact_info, requirements)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                       (id, sender, subject, body, date, sentiment, priority_label, priority_score, extracted, summary, draft, status, is_frustrated, contact_info, requirements, received_at, thread_id, account, draft_source, duplicate_of, attachments, truncated, llm_drafted_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CASE WHEN ? = 'llm' THEN datetime('now') END)''',
                     (email["id"], email["sender"], email["subject"], email["body"], email.get("date", ""),
                      processed.get("sentiment"), processed.get("priority_label"), processed.get("priority_score"),
                      json.dumps(processed.get("extracted")), processed.get("summary"), draft, status, 
-                     is_frustrated, contact_info, requirements))
+                     is_frustrated, contact_info, requirements, received_at, email.get("threadId"),
+                     email.get("account"), draft_source, duplicate_of, *_attachment_fields(email), draft_source))
+        if old_row:
+            self._apply_rollup(cur, old_row, -1)
+        self._apply_rollup(cur, (received_at, status, processed.get("priority_label"),
+                                 processed.get("sentiment"), email["sender"]), 1)
         self.conn.commit()
 
+    def save_follower(self, email, representative_id, status="Pending"):
+        """Store a thread/duplicate follower with the analysis (and, if Pending, the draft) of its representative.
+
+        Only for followers from the representative's own sender: the copied
+        draft and summary quote that sender's email.
+
+        Returns False when the representative is not stored, so the caller can process the email itself.
+        """
+        cur = self.conn.cursor()
+        cur.execute('''SELECT sentiment, priority_label, priority_score, extracted, summary, draft,
+                              is_frustrated, contact_info, requirements, draft_source FROM emails WHERE id=?''',
+                    (representative_id,))
+        rep = cur.fetchone()
+        if rep is None:
+            return False
+        old_row = self._rollup_row(cur, email["id"])
+        if old_row and old_row[1] == "Replied":
+            status = "Replied"
+        received_at = parse_received_at(email.get("date", ""))
+        draft, draft_source = (rep[5], rep[9]) if status != "Superseded" else (None, None)
+        cur.execute('''INSERT OR REPLACE INTO emails
+                       (id, sender, subject, body, date, sentiment, priority_label, priority_score, extracted, summary, draft, status, is_frustrated, contact_info, requirements, received_at, thread_id, duplicate_of, account, draft_source, attachments, truncated)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (email["id"], email["sender"], email["subject"], email["body"], email.get("date", ""),
+                     rep[0], rep[1], rep[2], rep[3], rep[4], draft, status, rep[6], rep[7], rep[8],
+                     received_at, email.get("threadId"), representative_id, email.get("account"), draft_source,
+                     *_attachment_fields(email)))
+        if old_row:
+            self._apply_rollup(cur, old_row, -1)
+        self._apply_rollup(cur, (received_at, status, rep[1], rep[0], email["sender"]), 1)
+        self.conn.commit()
+        return True
+
+    def supersede_thread(self, thread_id, newest_id):
+        """Mark older Pending messages of a thread as superseded by its newest message."""
+        if not thread_id:
+            return 0
+        cur = self.conn.cursor()
+        cur.execute('''SELECT id FROM emails WHERE thread_id=? AND id != ? AND status='Pending'
+                       AND received_at <= (SELECT received_at FROM emails WHERE id=?)''',
+                    (thread_id, newest_id, newest_id))
+        older = [email_id for (email_id,) in cur.fetchall()]
+        for email_id in older:
+            cur.execute("UPDATE emails SET duplicate_of=? WHERE id=?", (newest_id, email_id))
+            self.update_status(email_id, "Superseded")
+        return len(older)
+
+    def sender_of(self, email_id):
+        row = self.sender_and_sentiment(email_id)
+        return row[0] if row else None
+
+    def sender_and_sentiment(self, email_id):
+        cur = self.conn.cursor()
+        cur.execute("SELECT sender, sentiment FROM emails WHERE id=?", (email_id,))
+        return cur.fetchone()
+
+    def newest_in_thread(self, thread_id):
+        """(email_id, received_at) of the most recent stored message of a thread, or None."""
+        if not thread_id:
+            return None
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, received_at FROM emails WHERE thread_id=? ORDER BY received_at DESC LIMIT 1",
+                    (thread_id,))
+        return cur.fetchone()
+
+    def save_signature(self, email_id, signature, band_keys):
+        """Store an email's MinHash signature (bytes) and its LSH band buckets."""
+        cur = self.conn.cursor()
+        cur.execute("UPDATE emails SET minhash=? WHERE id=?", (signature, email_id))
+        cur.execute("DELETE FROM signature_bands WHERE email_id=?", (email_id,))
+        cur.executemany("INSERT INTO signature_bands (band, bucket, email_id) VALUES (?, ?, ?)",
+                        [(band, bucket, email_id) for band, bucket in band_keys])
+        self.conn.commit()
+
+    def signature_candidates(self, band_keys, exclude_id=None):
+        """Stored representatives sharing at least one LSH bucket: {email_id: signature bytes}."""
+        if not band_keys:
+            return {}
+        values = ", ".join("(?, ?)" for _ in band_keys)
+        params = [v for key in band_keys for v in key]
+        cur = self.conn.cursor()
+        cur.execute(f'''SELECT DISTINCT e.id, e.minhash FROM signature_bands b JOIN emails e ON e.id = b.email_id
+                        WHERE (b.band, b.bucket) IN (VALUES {values})
+                        AND e.duplicate_of IS NULL AND e.minhash IS NOT NULL AND e.id != ?''',
+                    params + [exclude_id or ""])
+        return dict(cur.fetchall())
+
     def list_emails(self, limit=100):
         cur = self.conn.cursor()
         cur.execute("SELECT * FROM emails ORDER BY priority_score DESC, date DESC LIMIT ?", (limit,))
         rows = cur.fetchall()
         return rows
+
+    def update_status(self, email_id, status):
+        cur = self.conn.cursor()
+        old_row = self._rollup_row(cur, email_id)
+        if old_row is None or old_row[1] == status:
+            return
+        cur.execute("UPDATE emails SET status=? WHERE id=?", (status, email_id))
+        self._apply_rollup(cur, old_row, -1)
+        self._apply_rollup(cur, (old_row[0], status) + tuple(old_row[2:]), 1)
+        self.conn.commit()
+
+    def iter_chunks(self, columns, chunk_size=1000, statuses=None):
+        """Yield lists of row tuples (rowid first) in rowid order, `chunk_size` rows at a time.
+
+        Keyset pagination on rowid, so writes made between chunks do not shift the cursor.
+        """
+        where = ""
+        params = []
+        if statuses:
+            where = f"AND status IN ({', '.join('?' for _ in statuses)})"
+            params = list(statuses)
+        last = 0
+        cur = self.conn.cursor()
+        while True:
+            cur.execute(f"SELECT rowid, {', '.join(columns)} FROM emails WHERE rowid > ? {where} "
+                        f"ORDER BY rowid LIMIT ?", [last] + params + [chunk_size])
+            rows = cur.fetchall()
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][0]
+
+    def update_priorities(self, updates):
+        """Write (email_id, priority_score, priority_label) triples in one transaction."""
+        cur = self.conn.cursor()
+        for email_id, score, label in updates:
+            old_row = self._rollup_row(cur, email_id)
+            if old_row is None:
+                continue
+            cur.execute("UPDATE emails SET priority_score=?, priority_label=? WHERE id=?", (score, label, email_id))
+            if old_row[2] != label:
+                self._apply_rollup(cur, old_row, -1)
+                self._apply_rollup(cur, old_row[:2] + (label,) + old_row[3:], 1)
+        self.conn.commit()
+
+    # --- Retention (see archive.py) ---
+
+    def archivable(self, cutoff, statuses, columns, limit):
+        """Up to `limit` emails with one of `statuses` received before `cutoff`, as dicts of `columns`."""
+        cur = self.conn.cursor()
+        cur.execute(f'''SELECT {", ".join(columns)} FROM emails
+                        WHERE status IN ({", ".join("?" for _ in statuses)}) AND received_at != '' AND received_at < ?
+                        ORDER BY received_at LIMIT ?''', list(statuses) + [cutoff, limit])
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    def remove_archived(self, archived):
+        """Delete archived (email_id, status) rows from the hot table and leave tombstones.
+
+        The rollups are left alone so analytics keep covering archived emails.
+        """
+        cur = self.conn.cursor()
+        cur.executemany("DELETE FROM emails WHERE id=?", [(email_id,) for email_id, _ in archived])
+        cur.executemany("DELETE FROM signature_bands WHERE email_id=?", [(email_id,) for email_id, _ in archived])
+        cur.executemany("INSERT OR REPLACE INTO archived_ids (id, status) VALUES (?, ?)", archived)
+        self.conn.commit()
+
+    def restore_archived(self, email):
+        """Put an archived email (dict of column values) back into the hot table."""
+        columns = list(email)
+        cur = self.conn.cursor()
+        cur.execute(f'''INSERT OR REPLACE INTO emails ({", ".join(columns)})
+                        VALUES ({", ".join("?" for _ in columns)})''', [email[c] for c in columns])
+        cur.execute("DELETE FROM archived_ids WHERE id=?", (email["id"],))
+        self.conn.commit()
+
+    # --- Mailbox accounts (see accounts.py) ---
+
+    def account_state(self, name):
+        """Sync cursor and today's processed count for an account."""
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        cur = self.conn.cursor()
+        cur.execute("SELECT cursor, quota_day, quota_used FROM accounts WHERE name=?", (name,))
+        row = cur.fetchone()
+        if row is None:
+            return {"cursor": None, "quota_used": 0}
+        return {"cursor": row[0], "quota_used": row[2] if row[1] == today else 0}
+
+    def record_poll(self, name, address, cursor, processed):
+        """Advance an account's cursor (never backwards) and add to today's quota usage."""
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        cur = self.conn.cursor()
+        cur.execute('''INSERT INTO accounts (name, address, cursor, quota_day, quota_used, last_poll_at, last_error)
+                       VALUES (?, ?, ?, ?, ?, datetime('now'), NULL)
+                       ON CONFLICT(name) DO UPDATE SET
+                           address = excluded.address,
+                           cursor = MAX(COALESCE(accounts.cursor, 0), COALESCE(excluded.cursor, 0)),
+                           quota_used = CASE WHEN accounts.quota_day = excluded.quota_day
+                                             THEN accounts.quota_used + excluded.quota_used
+                                             ELSE excluded.quota_used END,
+                           quota_day = excluded.quota_day,
+                           last_poll_at = excluded.last_poll_at,
+                           last_error = NULL''',
+                    (name, address, cursor, today, processed))
+        self.conn.commit()
+
+    def record_poll_error(self, name, error):
+        cur = self.conn.cursor()
+        cur.execute('''INSERT INTO accounts (name, last_poll_at, last_error) VALUES (?, datetime('now'), ?)
+                       ON CONFLICT(name) DO UPDATE SET last_poll_at = excluded.last_poll_at,
+                                                      last_error = excluded.last_error''', (name, error))
+        self.conn.commit()
+
+    def list_accounts(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT name, address, cursor, quota_day, quota_used, last_poll_at, last_error FROM accounts ORDER BY name")
+        names = ["name", "address", "cursor", "quota_day", "quota_used", "last_poll_at", "last_error"]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def get_checkpoint(self, source):
+        cur = self.conn.cursor()
+        cur.execute("SELECT position FROM ingest_checkpoints WHERE source=?", (source,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, source, position):
+        cur = self.conn.cursor()
+        cur.execute('''INSERT INTO ingest_checkpoints (source, position, updated_at) VALUES (?, ?, datetime('now'))
+                       ON CONFLICT(source) DO UPDATE SET position=excluded.position, updated_at=excluded.updated_at''',
+                    (source, position))
+        self.conn.commit()
+
+    def get_analysis(self, key):
+        cur = self.conn.cursor()
+        cur.execute("SELECT result FROM analysis_cache WHERE key=?", (key,))
+        row = cur.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_analysis(self, key, result):
+        cur = self.conn.cursor()
+        cur.execute("INSERT OR REPLACE INTO analysis_cache (key, result, created_at) VALUES (?, ?, datetime('now'))",
+                    (key, json.dumps(result)))
+        self.conn.commit()
+
+    def prune_analysis_cache(self, older_than_days):
+        """Drop cached analyses older than the cutoff, including those of superseded processor versions."""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM analysis_cache WHERE created_at < datetime('now', ?)", (f"-{older_than_days} days",))
+        self.conn.commit()
+        return cur.rowcount
+
+    def vacuum(self):
+        """Return the space freed by archiving to the filesystem."""
+        self.conn.execute("VACUUM")
+
+    def update_draft(self, email_id, draft, draft_source=None):
+        cur = self.conn.cursor()
+        if draft_source is None:
+            cur.execute("UPDATE emails SET draft=? WHERE id=?", (draft, email_id))
+        else:
+            cur.execute('''UPDATE emails SET draft=?, draft_source=?,
+                              llm_drafted_at=CASE WHEN ? = 'llm' THEN datetime('now') ELSE llm_drafted_at END
+                           WHERE id=?''', (draft, draft_source, draft_source, email_id))
+        self.conn.commit()
+
+    def template_followers(self, email_id):
+        """(id, sender) of Pending duplicates of `email_id` still holding a template draft."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, sender FROM emails WHERE duplicate_of=? AND status='Pending' AND draft_source='template'",
+                    (email_id,))
+        return cur.fetchall()
+
+    def upgrade_draft(self, email_id, draft, follower_ids=()):
+        """Replace a template draft with an LLM draft, also on the given followers (same sender only)."""
+        cur = self.conn.cursor()
+        cur.execute("UPDATE emails SET draft=?, draft_source='llm', llm_drafted_at=datetime('now') WHERE id=?",
+                    (draft, email_id))
+        cur.executemany("UPDATE emails SET draft=?, draft_source='llm' WHERE id=? AND draft_source='template'",
+                        [(draft, follower_id) for follower_id in follower_ids])
+        self.conn.commit()
+
+    def template_drafts(self, limit, email_id=None):
+        """Pending emails still holding a template draft, Urgent first and oldest first within a priority.
+
+        Duplicates sharing their representative's sender are left out: they
+        receive its LLM draft (see upgrade_draft). A requested `email_id` is
+        returned even if it is such a duplicate.
+        """
+        cur = self.conn.cursor()
+        where = "status='Pending' AND draft_source='template'"
+        params = []
+        if email_id is not None:
+            where += " AND id=?"
+            params.append(email_id)
+        else:
+            where += ''' AND NOT EXISTS (SELECT 1 FROM emails r
+                                     WHERE r.id = emails.duplicate_of AND LOWER(r.sender) = LOWER(emails.sender))'''
+        cur.execute(f'''SELECT id, sender, subject, body, date, sentiment, priority_label, priority_score,
+                               summary FROM emails WHERE {where}
+                        ORDER BY CASE priority_label WHEN 'Urgent' THEN 0 WHEN 'Medium' THEN 1 ELSE 2 END,
+                                 received_at LIMIT ?''', params + [limit])
+        names = ["id", "sender", "subject", "body", "date", "sentiment", "priority_label", "priority_score", "summary"]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def llm_drafts_today(self):
+        """LLM drafts written since midnight UTC, for the tiered draft budget."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM emails WHERE llm_drafted_at >= date('now')")
+        return cur.fetchone()[0]
+
+    def clear(self):
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM emails")
+        cur.execute("DELETE FROM email_rollup")
+        cur.execute("DELETE FROM sender_rollup")
+        cur.execute("DELETE FROM signature_bands")
+        cur.execute("DELETE FROM analysis_cache")
+        self.conn.commit()
+
+    def change_token(self):
+        """Cheap marker that changes whenever the database content changes.
+
+        PRAGMA data_version moves when another connection commits, and
+        total_changes counts writes made through this connection, so the
+        pair covers both sources of change without reading any table.
+        """
+        cur = self.conn.cursor()
+        cur.execute("PRAGMA data_version")
+        return (cur.fetchone()[0], self.conn.total_changes)
+
+    # --- Analytics (served from the rollup tables) ---
+
+    def count_by(self, column):
+        """Email counts grouped by 'status', 'priority_label' or 'sentiment'."""
+        if column not in ("status", "priority_label", "sentiment"):
+            raise ValueError(f"Unknown rollup column: {column}")
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {column}, SUM(count) FROM email_rollup GROUP BY {column} ORDER BY 2 DESC")
+        return dict(cur.fetchall())
+
+    def count_since(self, hours=24):
+        """Emails received in the last `hours` hours, at hour granularity."""
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+        cur = self.conn.cursor()
+        cur.execute("SELECT COALESCE(SUM(count), 0) FROM email_rollup WHERE bucket != '' AND bucket > ?",
+                    (cutoff.strftime("%Y-%m-%d %H"),))
+        return cur.fetchone()[0]
+
+    def daily_counts(self):
+        cur = self.conn.cursor()
+        cur.execute('''SELECT substr(bucket, 1, 10) AS day, SUM(count) FROM email_rollup
+                       WHERE bucket != '' GROUP BY day ORDER BY day''')
+        return cur.fetchall()
+
+    def top_senders(self, limit=5):
+        cur = self.conn.cursor()
+        cur.execute("SELECT sender, count FROM sender_rollup ORDER BY count DESC, sender LIMIT ?", (limit,))
+        return cur.fetchall()
+
+    def analytics_summary(self):
+        by_status = self.count_by("status")
+        return {
+            "total": sum(by_status.values()),
+            "last_24h": self.count_since(24),
+            "by_status": by_status,
+            "by_priority": self.count_by("priority_label"),
+            "by_sentiment": self.count_by("sentiment"),
+        }
+
+class SharedDatabase:
+    """A Database used by several threads at once (the dashboard's sessions and poll threads).
+
+    sqlite transactions belong to the connection, so two threads interleaving
+    statements on one connection can commit each other's half-done writes.
+    Every method call here holds one lock for its whole read-then-write and
+    commit; hold `lock` yourself around direct use of `conn`.
+    """
+    def __init__(self, db_path="db/emails.db"):
+        self._db = Database(db_path)
+        self.lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        # Only Database methods; attributes such as conn are returned as they are
+        if not callable(getattr(Database, name, None)):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+        return locked
@@ -0,0 +1,125 @@
+# src/dedup.py
+"""Thread grouping and near-duplicate detection ahead of processing.
+
+Only the newest message of each Gmail thread, and one representative per
+cluster of near-identical bodies, goes through process_email and
+generate_response. The others are stored against their representative
+(see Database.save_follower); near-duplicates from a different sender get
+their own template draft (see worker.process_new_emails). MinHash signatures are kept in the database
+so later batches are matched against earlier representatives too.
+"""
+import re
+import zlib
+import numpy as np
+from database import parse_received_at
+from text_utils import same_sender
+
+NUM_PERM = 64
+# 16 bands x 4 rows: pairs above roughly 0.5 Jaccard share at least one band bucket
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 3
+# Estimated Jaccard similarity (word 3-shingles) above which two bodies are one issue
+DUPLICATE_THRESHOLD = 0.7
+
+_PRIME = (1 << 32) - 5
+_rng = np.random.RandomState(20240101)
+# a < 2**31 and hashes < 2**32, so a * h + b stays within uint64
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def _dedup_text(email):
+    # Quoted history ("> ...") is shared by every reply in a thread and would make them all look alike
+    lines = [line for line in email.get("body", "").splitlines() if not line.lstrip().startswith(">")]
+    return f"{email.get('subject', '')}\n" + "\n".join(lines)
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(text):
+    """NUM_PERM-value MinHash of the text's word shingles (None for empty text)."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    return ((hashes[:, None] * _PERM_A + _PERM_B) % _PRIME).min(axis=0).astype(np.uint32)
+
+def band_keys(signature):
+    """One bucket key per LSH band; identical keys mark candidate duplicates."""
+    return [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes().hex())
+            for band in range(LSH_BANDS)]
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+class DedupPlan:
+    def __init__(self):
+        self.representatives = []  # emails to process, oldest first
+        self.followers = []        # (email, representative_id, reason)
+        self.signatures = {}       # email_id -> signature of each representative
+
+def plan(emails, db, threshold=DUPLICATE_THRESHOLD):
+    """Split a fetched batch into representatives to process and followers to attach."""
+    result = DedupPlan()
+
+    # 1. Threads: keep the newest message; earlier ones in the batch follow it
+    threads = {}
+    for email in emails:
+        threads.setdefault(email.get("threadId") or email["id"], []).append(email)
+    batch_ids = {email["id"] for email in emails}
+    newest = []
+    for thread_id, messages in threads.items():
+        messages.sort(key=lambda e: parse_received_at(e.get("date", "")))
+        latest = messages[-1]
+        # Mailboxes are read newest first, so a later message of the thread may already be stored
+        stored = db.newest_in_thread(thread_id)
+        if stored and stored[0] not in batch_ids and stored[1] > parse_received_at(latest.get("date", "")):
+            result.followers.extend((e, stored[0], "thread") for e in messages)
+            continue
+        newest.append(latest)
+        result.followers.extend((e, latest["id"], "thread") for e in messages[:-1])
+    newest.sort(key=lambda e: parse_received_at(e.get("date", "")))
+
+    # 2. Near-duplicates across threads and senders, against this batch and stored representatives
+    buckets = {}
+    for email in newest:
+        signature = minhash_signature(_dedup_text(email))
+        if signature is None:
+            result.representatives.append(email)
+            continue
+        keys = band_keys(signature)
+        candidates = {}
+        for key in keys:
+            for rep_id in buckets.get(key, ()):
+                candidates[rep_id] = result.signatures[rep_id]
+        for rep_id, stored in db.signature_candidates(keys, exclude_id=email["id"]).items():
+            candidates.setdefault(rep_id, np.frombuffer(stored, dtype=np.uint32))
+        match = max(candidates, key=lambda rep_id: similarity(signature, candidates[rep_id]), default=None)
+        if match is not None and similarity(signature, candidates[match]) >= threshold:
+            result.followers.append((email, match, "near_duplicate"))
+            continue
+        result.representatives.append(email)
+        result.signatures[email["id"]] = signature
+        for key in keys:
+            buckets.setdefault(key, []).append(email["id"])
+
+    # A thread's newest message may itself be a near-duplicate; point its thread at the final representative,
+    # but only when that is the same customer: older messages copy their target's analysis, contacts included
+    senders = {email["id"]: email["sender"] for email in emails}
+    redirect = {}
+    for e, rep_id, reason in result.followers:
+        if reason != "near_duplicate":
+            continue
+        rep_sender = senders[rep_id] if rep_id in senders else db.sender_of(rep_id)
+        if rep_sender is not None and same_sender(rep_sender, e["sender"]):
+            redirect[e["id"]] = rep_id
+    result.followers = [(e, redirect.get(rep_id, rep_id), reason) for e, rep_id, reason in result.followers]
+    # Near-duplicates first: a thread's older messages may follow one of them, which must be stored by then
+    result.followers.sort(key=lambda follower: follower[2] != "near_duplicate")
+    return result
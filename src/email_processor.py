@@ -1,13 +1,31 @@
 # src/email_processor.py
+import hashlib
+import importlib.util
+import json
+import os
 import re
 from typing import Dict, Any
-from rag_system import RAGSystem
+from rag_system import RAGSystem, URGENCY_KEYWORDS as RAG_URGENCY_KEYWORDS, \
+    FRUSTRATION_KEYWORDS as RAG_FRUSTRATION_KEYWORDS
+import metrics
 
-try:
-    from transformers import pipeline
-    _sent_pipeline = pipeline("sentiment-analysis")
-except Exception:
-    _sent_pipeline = None
+# Bump when process_email's logic changes, so cached analyses are recomputed
+PROCESSOR_VERSION = 1
+SENTIMENT_MODEL = os.environ.get("SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english")
+
+_UNLOADED = object()
+_sent_pipeline = _UNLOADED
+
+def get_sentiment_pipeline():
+    """Load the Hugging Face sentiment pipeline on first use (None if unavailable)."""
+    global _sent_pipeline
+    if _sent_pipeline is _UNLOADED:
+        try:
+            from transformers import pipeline
+            _sent_pipeline = pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+        except Exception:
+            _sent_pipeline = None
+    return _sent_pipeline
 
 PHONE_RE = re.compile(r"(\+?\d[\d\-\s]{7,}\d)")
 EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
@@ -29,16 +47,47 @@ FRUSTRATION_KEYWORDS = {
     "awful", "worst", "hate", "ridiculous", "unacceptable"
 }
 
+# Score thresholds for the priority labels (also used by rescore.py)
+URGENT_THRESHOLD = 4.0
+MEDIUM_THRESHOLD = 2.5
+
+def priority_label(score):
+    if score >= URGENT_THRESHOLD:
+        return "Urgent"
+    if score >= MEDIUM_THRESHOLD:
+        return "Medium"
+    return "Low"
+
+def processor_fingerprint():
+    """Hash of everything besides the email that process_email results depend on."""
+    if _sent_pipeline is None or (_sent_pipeline is _UNLOADED and importlib.util.find_spec("transformers") is None):
+        sentiment = "keywords"
+    else:
+        sentiment = SENTIMENT_MODEL
+    config = [PROCESSOR_VERSION, sentiment, sorted(CRITICAL_KEYWORDS), sorted(MODERATE_KEYWORDS),
+              sorted(FRUSTRATION_KEYWORDS), RAG_URGENCY_KEYWORDS, RAG_FRUSTRATION_KEYWORDS,
+              URGENT_THRESHOLD, MEDIUM_THRESHOLD]
+    return hashlib.sha256(json.dumps(config).encode("utf-8")).hexdigest()[:16]
+
+def analysis_key(email, is_paid=False):
+    """Content address of an analysis: subject, body, is_paid and the processor fingerprint."""
+    parts = [processor_fingerprint(), email.get("subject", "") or "", email.get("body", "") or "", str(int(is_paid))]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
 class EmailProcessor:
-    def __init__(self):
-        self.rag_system = RAGSystem()
+    def __init__(self, rag_system=None, cache=None):
+        # Reuse a shared RAGSystem when given so the embedding model is loaded once
+        self.rag_system = rag_system or RAGSystem()
+        # A Database: unchanged emails reuse their stored analysis instead of running the NLP stack again
+        self.cache = cache
 
     def sentiment(self, text: str) -> str:
         if not text:
             return "neutral"
-        if _sent_pipeline:
+        sent_pipeline = get_sentiment_pipeline()
+        if sent_pipeline:
             try:
-                r = _sent_pipeline(text[:512])[0]
+                r = sent_pipeline(text[:512])[0]
                 label = r.get("label", "").lower()
                 if label.startswith("neg"):
                     return "negative"
@@ -116,15 +165,7 @@ class EmailProcessor:
         if is_paid:
             score += 1.0
 
-        # More realistic thresholds
-        if score >= 4.0:
-            label = "Urgent"
-        elif score >= 2.5:
-            label = "Medium"
-        else:
-            label = "Low"
-            
-        return {"score": round(score, 2), "label": label}
+        return {"score": round(score, 2), "label": priority_label(score)}
 
     def summarize(self, text: str, max_len: int = 200) -> str:
         import re
@@ -137,10 +178,27 @@ class EmailProcessor:
         
         return summary
 
-    def process_email(self, email: Dict[str, Any], is_paid: bool = False) -> Dict[str, Any]:
+    def process_email(self, email: Dict[str, Any], is_paid: bool = False, sentiment: str = None) -> Dict[str, Any]:
+        """Analyse an email; a given `sentiment` (e.g. a near-duplicate's) skips the sentiment model."""
+        if self.cache is None or sentiment is not None:
+            return self._process_email(email, is_paid, sentiment)
+        cached = self.cache.get_analysis(analysis_key(email, is_paid))
+        metrics.record_cache("analysis", cached is not None)
+        if cached is not None:
+            return cached
+        result = self._process_email(email, is_paid)
+        # Keyed after the run: the sentiment model is only known to load (or not) once it has been used
+        self.cache.put_analysis(analysis_key(email, is_paid), result)
+        return result
+
+    def _process_email(self, email: Dict[str, Any], is_paid: bool = False, sentiment: str = None) -> Dict[str, Any]:
         text = (email.get("subject", "") or "") + "\n" + (email.get("body", "") or "")
-        sent = self.sentiment(text)
-        extracted = self.extract(text)
+        sent = sentiment
+        if sent is None:
+            with metrics.timed("sentiment"):
+                sent = self.sentiment(text)
+        with metrics.timed("extraction"):
+            extracted = self.extract(text)
         priority = self.priority(text, sent, extracted, is_paid=is_paid)
         summary = self.summarize(text)
         
@@ -0,0 +1,71 @@
+# src/embedding_backends.py
+"""Embedding backends for RAGSystem.
+
+Both backends return unit-length vectors, so retrieval scores are cosine
+similarities. Their scales differ, though (sparse TF-IDF overlaps are much
+smaller than sentence-embedding similarities), so each backend carries its
+own relevance `threshold`. Select one with RAG_BACKEND=dense|lexical.
+"""
+import os
+import numpy as np
+
+DEFAULT_BACKEND = "dense"
+DENSE_MODEL_NAME = "all-MiniLM-L6-v2"
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class DenseBackend:
+    """Sentence-transformers embeddings (the original retrieval model)."""
+
+    name = "dense"
+    sparse = False
+    threshold = 0.15
+
+    def __init__(self, model=None, model_name=DENSE_MODEL_NAME):
+        if model is None:
+            # Imported here so hosts using the lexical backend never load torch
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        self.model = model
+
+    def fit(self, chunks):
+        return _normalize(self.model.encode(chunks))
+
+    def encode_query(self, query):
+        return _normalize(self.model.encode([query]))[0]
+
+class LexicalBackend:
+    """Hashed TF-IDF vectors built with scikit-learn: no model download, millisecond queries."""
+
+    name = "lexical"
+    sparse = True
+    # Support queries top out around 0.05-0.12 against the knowledge base; unrelated mail mostly stays below 0.05
+    threshold = 0.05
+
+    def __init__(self, n_features=2 ** 18):
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+        # Token pattern keeps short product terms such as "2fa" and version numbers like "90"
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                                            ngram_range=(1, 2), token_pattern=r"(?u)\b\w+\b")
+        self.tfidf = TfidfTransformer(sublinear_tf=True)
+        self.model = None
+
+    def fit(self, chunks):
+        return self.tfidf.fit_transform(self.vectorizer.transform(chunks)).astype(np.float32).tocsr()
+
+    def encode_query(self, query):
+        return self.tfidf.transform(self.vectorizer.transform([query])).astype(np.float32).tocsr()
+
+BACKENDS = {"dense": DenseBackend, "lexical": LexicalBackend}
+
+def create_backend(name=None, model=None):
+    """Build the configured backend; an injected model always means the dense backend."""
+    if model is not None:
+        return DenseBackend(model=model)
+    name = name or os.environ.get("RAG_BACKEND", DEFAULT_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown RAG backend {name!r}; choose one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
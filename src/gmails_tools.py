@@ -3,54 +3,154 @@ from google.oauth2.credentials import Credentials
 import base64
 import email
 import os
+import re
+import metrics
+from text_utils import html_to_text, is_support_subject
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 TOKEN_PATH = "secrets/token.json"
 
-def get_service():
-    creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+# messages.list page size (Gmail allows up to 500)
+PAGE_SIZE = 100
+# Decoded body bytes kept per message; longer bodies are cut (and flagged "truncated")
+MAX_BODY_BYTES = 256 * 1024
+# Attachment metadata entries kept per message; attachment content is never downloaded
+MAX_ATTACHMENTS = 20
+
+def get_service(token_path=TOKEN_PATH):
+    creds = Credentials.from_authorized_user_file(token_path, SCOPES)
     return build('gmail', 'v1', credentials=creds)
 
+def get_profile_address(service):
+    """The mailbox's own address, used to ignore our own sent replies."""
+    return service.users().getProfile(userId="me").execute().get("emailAddress", "")
+
 def fetch_support_emails(max_results=10):
-    service = get_service()
-    results = service.users().messages().list(userId='me', maxResults=max_results).execute()
-    messages = results.get('messages', [])
-    emails = []
-
-    for msg in messages:
-        m = service.users().messages().get(userId='me', id=msg['id']).execute()
-        payload = m.get("payload", {})
-        headers = payload.get("headers", [])
-        subject = sender = date = ""
-        for h in headers:
-            if h["name"] == "From":
-                sender = h["value"]
-            if h["name"] == "Subject":
-                subject = h["value"]
-            if h["name"] == "Date":
-                date = h["value"]
-
-        body = ""
-        if "data" in payload.get("body", {}):
-            body = base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8", errors="ignore")
-        elif "parts" in payload:
-            for part in payload["parts"]:
-                if part.get("mimeType") == "text/plain":
-                    body = base64.urlsafe_b64decode(part["body"]["data"]).decode("utf-8", errors="ignore")
+    """The support emails among the newest `max_results` messages, as a list."""
+    return list(iter_support_emails(limit=max_results))
+
+def iter_support_emails(limit=None, page_size=PAGE_SIZE, query=None, service=None):
+    """Lazily yield support emails, newest first, paging through the mailbox with nextPageToken.
+
+    `limit` caps how many messages are examined (None walks the whole mailbox).
+    The next page is only listed once the caller has consumed the current one,
+    so a slow consumer holds at most one page of ids in memory.
+    """
+    service = service or get_service()
+    for message_id in list_message_ids(limit=limit, page_size=page_size, query=query, service=service):
+        parsed = fetch_message(message_id, service)
+        if is_support_subject(parsed["subject"]):
+            metrics.inc("emails_fetched_total")
+            yield parsed
+
+def list_message_ids(limit=None, page_size=PAGE_SIZE, query=None, service=None):
+    """Yield message ids newest first, listing one page at a time; nothing is downloaded."""
+    service = service or get_service()
+    seen = 0
+    page_token = None
+    while limit is None or seen < limit:
+        batch = page_size if limit is None else min(page_size, limit - seen)
+        params = {"userId": "me", "maxResults": batch}
+        if page_token:
+            params["pageToken"] = page_token
+        if query:
+            params["q"] = query
+        with metrics.timed("fetch"):
+            results = service.users().messages().list(**params).execute()
+        messages = results.get("messages", [])
+        for msg in messages[:batch]:
+            seen += 1
+            yield msg["id"]
+        page_token = results.get("nextPageToken")
+        if not page_token or not messages:
+            return
+
+def fetch_message(message_id, service=None):
+    """Download and parse one message (support or not)."""
+    service = service or get_service()
+    with metrics.timed("fetch"):
+        m = service.users().messages().get(userId='me', id=message_id).execute()
+        return parse_message(m, service)
+
+def parse_message(m, service=None):
+    """Turn a Gmail `messages.get` response into the email dict used by the pipeline."""
+    payload = m.get("payload", {})
+    subject = sender = date = ""
+    for h in payload.get("headers", []):
+        if h["name"] == "From":
+            sender = h["value"]
+        if h["name"] == "Subject":
+            subject = h["value"]
+        if h["name"] == "Date":
+            date = h["value"]
+
+    found = {"text/plain": None, "text/html": None, "attachments": [], "truncated": False}
+    _walk_parts(payload, found, m["id"], service)
+    body = found["text/plain"]
+    if body is None and found["text/html"] is not None:
+        body = html_to_text(found["text/html"])
+    return {
+        "id": m["id"],
+        "threadId": m.get("threadId", m["id"]),
+        "sender": sender,
+        "subject": subject,
+        "body": body or "",
+        "date": date,
+        "internal_date": int(m.get("internalDate", 0)),
+        "attachments": found["attachments"],
+        "truncated": found["truncated"],
+    }
+
+def _walk_parts(part, found, message_id, service):
+    """Depth-first MIME walk: keep the first text/plain and text/html bodies, list attachments."""
+    mime_type = part.get("mimeType", "")
+    body = part.get("body", {})
+    if part.get("filename") or (body.get("attachmentId") and not mime_type.startswith("text/")):
+        if len(found["attachments"]) < MAX_ATTACHMENTS:
+            found["attachments"].append({"filename": part.get("filename", ""), "mimeType": mime_type,
+                                         "size": body.get("size", 0)})
+        return
+    if mime_type in ("text/plain", "text/html") and found[mime_type] is None:
+        text = _decode_body(part, found, message_id, service)
+        if text is not None:
+            found[mime_type] = text
+    # A single-part message has no mimeType on some API versions; treat its body as plain text
+    elif not mime_type and "data" in body and found["text/plain"] is None:
+        found["text/plain"] = _decode_body(part, found, message_id, service)
+    for child in part.get("parts", []):
+        _walk_parts(child, found, message_id, service)
+
+def _decode_body(part, found, message_id, service):
+    body = part.get("body", {})
+    data = body.get("data")
+    if data is None and body.get("attachmentId") and service is not None:
+        # Gmail moves large bodies out of line; the API has no ranged download, so oversized ones are cut below
+        data = service.users().messages().attachments().get(
+            userId="me", messageId=message_id, id=body["attachmentId"]).execute().get("data")
+    if data is None:
+        return None
+    # Base64 expands 3 bytes to 4 characters, so cut before decoding rather than after
+    max_chars = (MAX_BODY_BYTES // 3) * 4
+    if len(data) > max_chars:
+        data = data[:max_chars]
+        found["truncated"] = True
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    return raw.decode(_charset(part), errors="ignore")
+
+def _charset(part):
+    for h in part.get("headers", []):
+        if h["name"].lower() == "content-type":
+            match = re.search(r'charset="?([\w\-]+)"?', h["value"], re.I)
+            if match:
+                try:
+                    "".encode(match.group(1))
+                    return match.group(1)
+                except LookupError:
                     break
+    return "utf-8"
 
-        if any(k in subject.lower() for k in ["support", "query", "request", "help"]):
-            emails.append({
-                "id": m["id"],
-                "sender": sender,
-                "subject": subject,
-                "body": body,
-                "date": date
-            })
-    return emails
-
-def send_reply(to, subject, body):
-    service = get_service()
+def send_reply(to, subject, body, service=None):
+    service = service or get_service()
     msg = email.message.EmailMessage()
     msg.set_content(body)
     msg["To"] = to
@@ -59,4 +159,6 @@ def send_reply(to, subject, body):
 
     raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
     message = {"raw": raw}
-    service.users().messages().send(userId="me", body=message).execute()
+    with metrics.timed("send"):
+        service.users().messages().send(userId="me", body=message).execute()
+    metrics.inc("replies_sent_total")
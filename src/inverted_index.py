@@ -0,0 +1,47 @@
+# src/inverted_index.py
+"""Small in-memory inverted index with BM25 scoring."""
+import math
+import re
+from collections import Counter, defaultdict
+
+# Word characters only, so "2FA", "PayPal" and the "90" of "Chrome 90+" are all exact terms
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "i", "if",
+    "in", "is", "it", "its", "me", "my", "no", "not", "of", "on", "or", "our", "so", "that", "the",
+    "this", "to", "was", "we", "with", "you", "your",
+}
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class InvertedIndex:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_id, term_frequency)]
+        self.doc_lengths = []
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc_id, tf))
+        self.n_docs = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / self.n_docs) if self.n_docs else 0.0
+        self.idf = {term: math.log(1 + (self.n_docs - len(p) + 0.5) / (len(p) + 0.5))
+                    for term, p in self.postings.items()}
+
+    def search(self, query, limit=50):
+        """Return up to `limit` (doc_id, bm25_score) pairs for documents sharing a query term."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1.0))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
@@ -0,0 +1,144 @@
+# src/job_queue.py
+import sqlite3
+import os
+import json
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class JobQueue:
+    """Durable job queue kept in its own SQLite file.
+
+    It is deliberately separate from the emails database: queue and heartbeat
+    writes would otherwise bump that database's data_version and invalidate
+    the dashboard caches on every poll. Jobs are claimed with a lease: a worker that dies mid-job simply lets the
+    lease expire and the job becomes claimable again, so work survives restarts.
+    """
+
+    def __init__(self, db_path="db/jobs.db"):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        # Autocommit mode so claims can use an explicit BEGIN IMMEDIATE transaction
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        cur = self.conn.cursor()
+        cur.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        kind TEXT NOT NULL,
+                        payload TEXT,
+                        status TEXT NOT NULL,
+                        priority INTEGER NOT NULL DEFAULT 100,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        max_attempts INTEGER NOT NULL DEFAULT 3,
+                        dedupe_key TEXT,
+                        lease_owner TEXT,
+                        lease_expires REAL,
+                        created_at REAL,
+                        updated_at REAL,
+                        result TEXT,
+                        error TEXT)''')
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, id)")
+        cur.execute('''CREATE TABLE IF NOT EXISTS workers (
+                        worker_id TEXT PRIMARY KEY,
+                        heartbeat_at REAL,
+                        info TEXT)''')
+
+    def enqueue(self, kind, payload=None, priority=100, dedupe_key=None, max_attempts=3):
+        """Add a job and return its id.
+
+        With a dedupe_key, an existing queued or running job with the same key
+        is returned instead, so repeated button clicks do not pile up work.
+        """
+        now = time.time()
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe_key:
+                cur.execute("SELECT id FROM jobs WHERE dedupe_key=? AND status IN (?, ?)",
+                            (dedupe_key, QUEUED, RUNNING))
+                row = cur.fetchone()
+                if row:
+                    cur.execute("COMMIT")
+                    return row["id"]
+            cur.execute('''INSERT INTO jobs (kind, payload, status, priority, max_attempts, dedupe_key, created_at, updated_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                        (kind, json.dumps(payload or {}), QUEUED, priority, max_attempts, dedupe_key, now, now))
+            job_id = cur.lastrowid
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker_id, lease_seconds=600):
+        """Lease the next runnable job (lowest priority value first), or return None."""
+        now = time.time()
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute('''SELECT * FROM jobs
+                           WHERE status=? OR (status=? AND lease_expires < ?)
+                           ORDER BY priority, id LIMIT 1''', (QUEUED, RUNNING, now))
+            row = cur.fetchone()
+            if row is None:
+                cur.execute("COMMIT")
+                return None
+            if row["attempts"] >= row["max_attempts"]:
+                # Lease expired on the final attempt: the worker died while running it
+                cur.execute("UPDATE jobs SET status=?, error=?, lease_owner=NULL, updated_at=? WHERE id=?",
+                            (FAILED, "lease expired", now, row["id"]))
+                cur.execute("COMMIT")
+                return self.claim(worker_id, lease_seconds)
+            cur.execute('''UPDATE jobs SET status=?, attempts=attempts+1, lease_owner=?, lease_expires=?, updated_at=?
+                           WHERE id=?''', (RUNNING, worker_id, now + lease_seconds, now, row["id"]))
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"] or "{}")
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job_id, worker_id, result=None):
+        self.conn.execute('''UPDATE jobs SET status=?, result=?, error=NULL, lease_owner=NULL, lease_expires=NULL, updated_at=?
+                             WHERE id=? AND lease_owner=?''',
+                          (DONE, json.dumps(result), time.time(), job_id, worker_id))
+
+    def fail(self, job_id, worker_id, error):
+        """Record a failure; the job is retried until it runs out of attempts."""
+        self.conn.execute('''UPDATE jobs SET status=CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+                                             error=?, lease_owner=NULL, lease_expires=NULL, updated_at=?
+                             WHERE id=? AND lease_owner=?''',
+                          (QUEUED, FAILED, str(error), time.time(), job_id, worker_id))
+
+    def extend_lease(self, job_id, worker_id, lease_seconds=600):
+        """Push a running job's lease forward; a no-op once it has finished or been re-claimed."""
+        self.conn.execute("UPDATE jobs SET lease_expires=? WHERE id=? AND lease_owner=? AND status=?",
+                          (time.time() + lease_seconds, job_id, worker_id, RUNNING))
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent_jobs(self, limit=20):
+        rows = self.conn.execute('''SELECT id, kind, payload, status, attempts, error, created_at, updated_at
+                                    FROM jobs ORDER BY id DESC LIMIT ?''', (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def heartbeat(self, worker_id, info=None):
+        self.conn.execute('''INSERT INTO workers (worker_id, heartbeat_at, info) VALUES (?, ?, ?)
+                             ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at=excluded.heartbeat_at, info=excluded.info''',
+                          (worker_id, time.time(), json.dumps(info or {})))
+
+    def active_workers(self, max_age=120):
+        rows = self.conn.execute("SELECT worker_id, heartbeat_at, info FROM workers WHERE heartbeat_at > ?",
+                                 (time.time() - max_age,)).fetchall()
+        return [dict(r) for r in rows]
@@ -0,0 +1,93 @@
+# src/memory_report.py
+"""Per-component memory accounting (python main.py --memory-report)."""
+import os
+import resource
+import sys
+import tracemalloc
+
+def current_rss():
+    """Resident set size in bytes (falls back to peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class _Measure:
+    def __init__(self, report, component):
+        self.report = report
+        self.component = component
+
+    def __enter__(self):
+        self.rss = current_rss()
+        self.traced = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        self.report.append({
+            "component": self.component,
+            "rss_delta": current_rss() - self.rss,
+            "traced_delta": tracemalloc.get_traced_memory()[0] - self.traced,
+        })
+        return False
+
+def build_report(knowledge_base_path="data/knowledge_base.txt", embedding_dtype=None):
+    """Load every heavy component once and record how much memory each one adds.
+
+    tracemalloc only sees Python allocations, so model weights (allocated by
+    torch) show up mainly in the RSS column.
+    """
+    tracemalloc.start()
+    report = []
+    start_rss = current_rss()
+
+    with _Measure(report, "sentiment model"):
+        import email_processor
+        email_processor.get_sentiment_pipeline()
+    with _Measure(report, "embedding model"):
+        from embedding_backends import create_backend
+        backend = create_backend()
+    with _Measure(report, "knowledge base + embeddings"):
+        from rag_system import RAGSystem
+        rag = RAGSystem(knowledge_base_path, embedding_dtype=embedding_dtype, backend=backend)
+    with _Measure(report, "processor + responder (shared RAGSystem)"):
+        from response_generator import ResponseGenerator
+        email_processor.EmailProcessor(rag_system=rag)
+        ResponseGenerator(rag_system=rag)
+
+    usage = rag.memory_usage()
+    tracemalloc.stop()
+    return {
+        "components": report,
+        "rag": usage,
+        "embedding_dtype": rag.embedding_dtype if not rag.backend.sparse else "sparse",
+        "backend": rag.backend.name,
+        "chunks": len(rag.knowledge_chunks),
+        "start_rss": start_rss,
+        "total_rss": current_rss(),
+    }
+
+def format_report(data):
+    mb = 1024 * 1024
+    lines = [f"{'component':<42} {'RSS +MB':>9} {'traced +MB':>11}"]
+    for row in data["components"]:
+        lines.append(f"{row['component']:<42} {row['rss_delta'] / mb:>9.1f} {row['traced_delta'] / mb:>11.2f}")
+    rag = data["rag"]
+    lines.append("")
+    lines.append(f"RAG ({data['backend']} backend, {data['chunks']} chunks, {data['embedding_dtype']} embeddings): "
+                 f"embeddings {rag['embeddings'] / 1024:.1f} KB, chunk text {rag['chunks'] / 1024:.1f} KB, "
+                 f"query cache {rag['query_cache'] / 1024:.1f} KB")
+    lines.append(f"Process RSS: {data['start_rss'] / mb:.1f} MB at start, {data['total_rss'] / mb:.1f} MB with everything loaded")
+    return "\n".join(lines)
+
+def print_report(knowledge_base_path="data/knowledge_base.txt", embedding_dtype=None):
+    print(format_report(build_report(knowledge_base_path, embedding_dtype)))
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    print_report()
@@ -0,0 +1,189 @@
+# src/metrics.py
+"""In-process metrics and tracing for the ingestion path.
+
+Counters and latency histograms live in a module-level registry, can be
+rendered in the Prometheus text format (see start_http_server) and are
+snapshotted into the worker heartbeat for the dashboard's System health
+panel. Per-email trace spans are kept only when tracing is enabled.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "email_assistant_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th observation (coarse, like Prometheus)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+class MetricsRegistry:
+    def __init__(self, trace_limit=50):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.tracing = os.environ.get("EMAIL_TRACE", "") not in ("", "0", "false")
+        self.traces = deque(maxlen=trace_limit)
+        self._local = threading.local()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = _Histogram(LATENCY_BUCKETS)
+            hist.observe(value)
+
+    def value(self, name, **labels):
+        return self.counters.get((name, _label_key(labels)), 0)
+
+    @contextmanager
+    def timed(self, stage):
+        """Record latency (and errors) of a pipeline stage, plus a span on the active trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("stage_errors_total", stage=stage)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("stage_latency_seconds", elapsed, stage=stage)
+            spans = getattr(self._local, "spans", None)
+            if spans is not None:
+                spans.append({"stage": stage, "start_ms": round((start - self._local.started) * 1000, 3),
+                              "duration_ms": round(elapsed * 1000, 3)})
+
+    @contextmanager
+    def trace(self, email_id):
+        """Collect the spans of every timed() stage run for one email."""
+        if not self.tracing:
+            yield
+            return
+        self._local.spans = []
+        self._local.started = time.perf_counter()
+        try:
+            yield
+        finally:
+            spans, self._local.spans = self._local.spans, None
+            self.traces.append({"email_id": email_id, "at": time.time(),
+                                "total_ms": round((time.perf_counter() - self._local.started) * 1000, 3),
+                                "spans": spans})
+
+    def record_cache(self, cache, hit):
+        self.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def cache_hit_rates(self):
+        totals = {}
+        with self._lock:
+            counters = list(self.counters.items())
+        for (name, key), value in counters:
+            if name != "cache_requests_total":
+                continue
+            labels = dict(key)
+            hits, total = totals.get(labels["cache"], (0, 0))
+            totals[labels["cache"]] = (hits + (value if labels["result"] == "hit" else 0), total + value)
+        return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+    def snapshot(self):
+        """JSON-friendly summary used by the dashboard."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(key), "value": value}
+                        for (name, key), value in sorted(self.counters.items())]
+            stages = [{"name": name, "labels": dict(key), "count": h.count, "sum": h.sum,
+                       "avg_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                       "p95_ms": h.quantile(0.95) * 1000}
+                      for (name, key), h in sorted(self.histograms.items())]
+        return {"counters": counters, "histograms": stages, "cache_hit_rates": self.cache_hit_rates(),
+                "traces": list(self.traces)[-10:]}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for (n, key), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{PREFIX}{name}{_format_labels(key)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, key), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', '+Inf')])} {h.count}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+trace = REGISTRY.trace
+record_cache = REGISTRY.record_cache
+
+def start_http_server(port, registry=REGISTRY, host="0.0.0.0"):
+    """Serve the registry at http://host:port/metrics from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
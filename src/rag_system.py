@@ -1,17 +1,57 @@
 # src/rag_system.py
 import os
 import re
-from sentence_transformers import SentenceTransformer
+import time
+from collections import OrderedDict
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
+import metrics
+from embedding_backends import create_backend
+from inverted_index import InvertedIndex
+
+QUERY_CACHE_SIZE = 256
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+# Rows scored per block, so upcasting a quantized matrix needs only a small temporary
+SCORE_BLOCK_ROWS = 4096
+RETRIEVAL_MODES = ("dense", "hybrid")
+# Hybrid mode scores densely only the best BM25 candidates
+HYBRID_SHORTLIST = 50
+# Used for injected backends that do not define their own `threshold`
+RELEVANCE_THRESHOLD = 0.15
+
+URGENCY_KEYWORDS = ['urgent', 'immediately', 'asap', 'critical', 'emergency', 'cannot access', 'locked out', 'broken', 'not working']
+FRUSTRATION_KEYWORDS = ['frustrated', 'angry', 'upset', 'disappointed', 'terrible', 'awful', 'worst', 'hate', 'ridiculous']
+
+def _nbytes(value):
+    if hasattr(value, "indptr"):
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    return value.nbytes
 
 class RAGSystem:
-    def __init__(self, knowledge_base_path="data/knowledge_base.txt"):
+    def __init__(self, knowledge_base_path="data/knowledge_base.txt", model=None, embedding_dtype=None,
+                 backend=None, retrieval=None):
         self.knowledge_base_path = knowledge_base_path
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # `backend` is a name ("dense", "lexical") or a backend instance; default from RAG_BACKEND.
+        # Any object with a SentenceTransformer-style encode() can be injected as `model` (e.g. offline fakes)
+        self.backend = backend if hasattr(backend, "encode_query") else create_backend(backend, model=model)
+        self.model = self.backend.model
+        self.embedding_dtype = embedding_dtype or os.environ.get("RAG_EMBEDDING_DTYPE", "float32")
+        if self.embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"embedding_dtype must be one of {EMBEDDING_DTYPES}, got {self.embedding_dtype!r}")
+        self.retrieval = retrieval or os.environ.get("RAG_RETRIEVAL", "dense")
+        if self.retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval must be one of {RETRIEVAL_MODES}, got {self.retrieval!r}")
+        # Weight of the dense score in hybrid fusion; the rest goes to normalised BM25
+        self.hybrid_alpha = float(os.environ.get("RAG_HYBRID_ALPHA", "0.7"))
+        self.index = None
+        self.index_build_seconds = 0.0
         self.knowledge_chunks = []
+        # Unit-normalised rows stored as float32, float16 or int8 (with chunk_scales);
+        # the lexical backend keeps a sparse float32 matrix instead
         self.chunk_embeddings = None
+        self.chunk_scales = None
+        # Re-fetches and regenerations query with the same text, so keep recent query embeddings
+        self._query_cache = OrderedDict()
         self.load_knowledge_base()
     
     def load_knowledge_base(self):
@@ -37,48 +77,150 @@ class RAGSystem:
             
             # Generate embeddings for chunks
             if self.knowledge_chunks:
-                self.chunk_embeddings = self.model.encode(self.knowledge_chunks)
+                self._store_embeddings(self.backend.fit(self.knowledge_chunks))
                 
         except Exception as e:
             print(f"Error loading knowledge base: {e}")
             self.knowledge_chunks = ["General support information available."]
-            self.chunk_embeddings = self.model.encode(self.knowledge_chunks)
+            self._store_embeddings(self.backend.fit(self.knowledge_chunks))
+        if self.retrieval == "hybrid":
+            self.build_index()
+
+    def build_index(self):
+        start = time.perf_counter()
+        self.index = InvertedIndex(self.knowledge_chunks)
+        self.index_build_seconds = time.perf_counter() - start
+
+    def _store_embeddings(self, embeddings):
+        """Keep unit-normalised chunk embeddings in the configured storage dtype."""
+        self.chunk_scales = None
+        if self.backend.sparse:
+            self.chunk_embeddings = embeddings
+        elif self.embedding_dtype == "float16":
+            self.chunk_embeddings = embeddings.astype(np.float16)
+        elif self.embedding_dtype == "int8":
+            # Symmetric per-vector quantisation: row ~= int8_row * scale
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.chunk_embeddings = np.round(embeddings / scales[:, None]).astype(np.int8)
+            self.chunk_scales = scales.astype(np.float32)
+        else:
+            self.chunk_embeddings = embeddings
+
+    def _score(self, query_vector):
+        """Cosine similarity of a unit query vector against every stored chunk."""
+        if self.backend.sparse:
+            return (self.chunk_embeddings @ query_vector.T).toarray().ravel()
+        if self.chunk_embeddings.dtype == np.float32:
+            return self.chunk_embeddings @ query_vector
+        scores = np.empty(len(self.chunk_embeddings), dtype=np.float32)
+        for start in range(0, len(self.chunk_embeddings), SCORE_BLOCK_ROWS):
+            block = self.chunk_embeddings[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = block @ query_vector
+        if self.chunk_scales is not None:
+            scores *= self.chunk_scales
+        return scores
+
+    def _score_rows(self, query_vector, rows):
+        """Like _score, but only for the given chunk rows."""
+        block = self.chunk_embeddings[rows].astype(np.float32)
+        scores = block @ query_vector
+        if self.chunk_scales is not None:
+            scores *= self.chunk_scales[rows]
+        return scores
+
+    def memory_usage(self):
+        """Bytes held by the knowledge base: embeddings, chunk text and the query cache."""
+        embeddings = _nbytes(self.chunk_embeddings) if self.chunk_embeddings is not None else 0
+        if self.chunk_scales is not None:
+            embeddings += self.chunk_scales.nbytes
+        return {
+            "embeddings": embeddings,
+            "chunks": sum(len(c.encode("utf-8")) for c in self.knowledge_chunks),
+            "query_cache": sum(_nbytes(v) + len(k) for k, v in self._query_cache.items()),
+        }
     
+    def _encode_query(self, query):
+        cached = self._query_cache.get(query)
+        metrics.record_cache("query_embedding", cached is not None)
+        if cached is not None:
+            self._query_cache.move_to_end(query)
+            return cached
+        embedding = self.backend.encode_query(query)
+        self._query_cache[query] = embedding
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return embedding
+
     def retrieve_relevant_context(self, query, top_k=3):
         """Retrieve most relevant knowledge base chunks for a query"""
+        with metrics.timed("retrieval"):
+            return self._retrieve_relevant_context(query, top_k)
+
+    def _retrieve_relevant_context(self, query, top_k):
         if not self.knowledge_chunks:
             return []
         
-        query_embedding = self.model.encode([query])
-        similarities = cosine_similarity(query_embedding, self.chunk_embeddings)[0]
+        if self.retrieval == "hybrid" and not self.backend.sparse:
+            ranked = self._rank_hybrid(query, top_k)
+        else:
+            ranked = self._rank_dense(query, top_k)
+        relevant_chunks = []
+        threshold = getattr(self.backend, "threshold", RELEVANCE_THRESHOLD)
+        
+        for i, score in ranked:
+            if score > threshold:  # Higher threshold for better relevance
+                relevant_chunks.append(self._format_chunk(self.knowledge_chunks[i]))
+        
+        return relevant_chunks
+
+    def _rank_dense(self, query, top_k):
+        similarities = self._score(self._encode_query(query))
         
         # Get top-k most similar chunks
         top_indices = np.argsort(similarities)[-top_k:][::-1]
-        relevant_chunks = []
+        return [(int(i), float(similarities[i])) for i in top_indices]
+
+    def _rank_hybrid(self, query, top_k):
+        """BM25 shortlist from the inverted index, dense rerank, then score fusion.
+
+        Returns (chunk, dense score) in fused order: the relevance threshold
+        applies to the dense similarity, since the normalised BM25 term would
+        lift any chunk sharing a single word with the query past it.
+        """
+        candidates = self.index.search(query, HYBRID_SHORTLIST)
+        if not candidates:
+            # No shared terms at all: fall back to a full dense scan
+            metrics.inc("hybrid_queries_total", outcome="fallback")
+            return self._rank_dense(query, top_k)
+        metrics.inc("hybrid_queries_total", outcome="shortlist")
+        rows = np.array([doc_id for doc_id, _ in candidates])
+        lexical = np.array([score for _, score in candidates], dtype=np.float32)
+        lexical /= lexical.max()
+        dense = self._score_rows(self._encode_query(query), rows)
+        fused = self.hybrid_alpha * dense + (1 - self.hybrid_alpha) * lexical
+        order = np.argsort(fused)[-top_k:][::-1]
+        return [(int(rows[j]), float(dense[j])) for j in order]
+
+    def _format_chunk(self, chunk):
+        # Clean up the chunk - remove redundant headers and format better
+        if chunk.startswith("ACCOUNT & LOGIN ISSUES:"):
+            chunk = chunk.replace("ACCOUNT & LOGIN ISSUES:", "").strip()
+        elif chunk.startswith("BILLING & PAYMENTS:"):
+            chunk = chunk.replace("BILLING & PAYMENTS:", "").strip()
+        elif chunk.startswith("TECHNICAL SUPPORT:"):
+            chunk = chunk.replace("TECHNICAL SUPPORT:", "").strip()
+        elif chunk.startswith("PRODUCT FEATURES:"):
+            chunk = chunk.replace("PRODUCT FEATURES:", "").strip()
         
-        for i in top_indices:
-            if similarities[i] > 0.15:  # Higher threshold for better relevance
-                chunk = self.knowledge_chunks[i]
-                # Clean up the chunk - remove redundant headers and format better
-                if chunk.startswith("ACCOUNT & LOGIN ISSUES:"):
-                    chunk = chunk.replace("ACCOUNT & LOGIN ISSUES:", "").strip()
-                elif chunk.startswith("BILLING & PAYMENTS:"):
-                    chunk = chunk.replace("BILLING & PAYMENTS:", "").strip()
-                elif chunk.startswith("TECHNICAL SUPPORT:"):
-                    chunk = chunk.replace("TECHNICAL SUPPORT:", "").strip()
-                elif chunk.startswith("PRODUCT FEATURES:"):
-                    chunk = chunk.replace("PRODUCT FEATURES:", "").strip()
-                
-                # Ensure complete sentences
-                if not chunk.endswith('.'):
-                    # Try to find the last complete sentence
-                    last_period = chunk.rfind('.')
-                    if last_period > len(chunk) * 0.7:  # Only if the period is near the end
-                        chunk = chunk[:last_period + 1]
-                
-                relevant_chunks.append(chunk.strip())
+        # Ensure complete sentences
+        if not chunk.endswith('.'):
+            # Try to find the last complete sentence
+            last_period = chunk.rfind('.')
+            if last_period > len(chunk) * 0.7:  # Only if the period is near the end
+                chunk = chunk[:last_period + 1]
         
-        return relevant_chunks
+        return chunk.strip()
     
     def extract_contact_info(self, email_body):
         """Extract phone numbers and email addresses from email body"""
@@ -95,11 +237,8 @@ class RAGSystem:
     
     def extract_requirements(self, email_body):
         """Extract customer requirements and urgency indicators"""
-        urgency_keywords = ['urgent', 'immediately', 'asap', 'critical', 'emergency', 'cannot access', 'locked out', 'broken', 'not working']
-        frustration_keywords = ['frustrated', 'angry', 'upset', 'disappointed', 'terrible', 'awful', 'worst', 'hate', 'ridiculous']
-        
-        urgency_score = sum(1 for keyword in urgency_keywords if keyword.lower() in email_body.lower())
-        frustration_score = sum(1 for keyword in frustration_keywords if keyword.lower() in email_body.lower())
+        urgency_score = sum(1 for keyword in URGENCY_KEYWORDS if keyword.lower() in email_body.lower())
+        frustration_score = sum(1 for keyword in FRUSTRATION_KEYWORDS if keyword.lower() in email_body.lower())
         
         # Extract sentences containing question words or request indicators
         sentences = re.split(r'[.!?]+', email_body)
@@ -0,0 +1,111 @@
+# src/rescore.py
+"""Re-rank stored emails after the priority rules change (python main.py rescore).
+
+Mirrors EmailProcessor.priority without re-running sentiment or extraction:
+stored emails are streamed in chunks, turned into a keyword presence matrix
+over a fixed vocabulary, scored with one matrix-vector product and written
+back one transaction per chunk. The stored sentiment is reused.
+"""
+import time
+from collections import Counter
+import numpy as np
+import metrics
+from email_processor import (CRITICAL_KEYWORDS, MODERATE_KEYWORDS, FRUSTRATION_KEYWORDS,
+                             URGENT_THRESHOLD, MEDIUM_THRESHOLD)
+from rag_system import URGENCY_KEYWORDS, FRUSTRATION_KEYWORDS as REQUIREMENT_FRUSTRATION_KEYWORDS
+
+LOGIN_TERMS = ("login", "password")
+PAYMENT_TERMS = ("payment", "billing", "refund")
+LOCK_TERMS = ("locked", "blocked")
+
+VOCABULARY = sorted(set(CRITICAL_KEYWORDS) | set(MODERATE_KEYWORDS) | set(FRUSTRATION_KEYWORDS)
+                    | set(URGENCY_KEYWORDS) | set(REQUIREMENT_FRUSTRATION_KEYWORDS)
+                    | set(LOGIN_TERMS) | set(PAYMENT_TERMS) | set(LOCK_TERMS) | {"account"})
+_COLUMN = {term: i for i, term in enumerate(VOCABULARY)}
+
+def _cols(terms):
+    return [_COLUMN[t] for t in terms]
+
+# Feature weights, in the order built by feature_matrix (same values as EmailProcessor.priority)
+WEIGHTS = np.array([
+    3.0,  # any critical keyword
+    1.0,  # else any moderate keyword
+    1.5,  # any frustration keyword
+    1.0,  # login / password
+    1.5,  # payment / billing / refund
+    2.0,  # account locked / blocked
+    1.0,  # negative sentiment
+    0.5,  # per urgency indicator (RAGSystem.extract_requirements)
+    0.3,  # per frustration indicator (RAGSystem.extract_requirements)
+])
+
+def keyword_matrix(texts):
+    """Boolean (len(texts), len(VOCABULARY)) matrix: does the lower-cased text contain each term."""
+    lowered = [t.lower() for t in texts]
+    return np.array([[term in t for term in VOCABULARY] for t in lowered], dtype=bool).reshape(len(texts), len(VOCABULARY))
+
+def feature_matrix(presence, negative):
+    critical = presence[:, _cols(CRITICAL_KEYWORDS)].any(axis=1)
+    return np.column_stack([
+        critical,
+        ~critical & presence[:, _cols(MODERATE_KEYWORDS)].any(axis=1),
+        presence[:, _cols(FRUSTRATION_KEYWORDS)].any(axis=1),
+        presence[:, _cols(LOGIN_TERMS)].any(axis=1),
+        presence[:, _cols(PAYMENT_TERMS)].any(axis=1),
+        presence[:, _COLUMN["account"]] & presence[:, _cols(LOCK_TERMS)].any(axis=1),
+        negative,
+        presence[:, _cols(URGENCY_KEYWORDS)].sum(axis=1),
+        presence[:, _cols(REQUIREMENT_FRUSTRATION_KEYWORDS)].sum(axis=1),
+    ]).astype(np.float64)
+
+def score_chunk(subjects, bodies, sentiments):
+    """Return (scores, labels) arrays for one chunk of stored emails."""
+    texts = [f"{s or ''}\n{b or ''}" for s, b in zip(subjects, bodies)]
+    negative = np.array([s == "negative" for s in sentiments], dtype=bool)
+    scores = feature_matrix(keyword_matrix(texts), negative) @ WEIGHTS
+    labels = np.where(scores >= URGENT_THRESHOLD, "Urgent", np.where(scores >= MEDIUM_THRESHOLD, "Medium", "Low"))
+    return np.round(scores, 2), labels
+
+def rescore(db, chunk_size=1000, statuses=None, dry_run=False, log=print):
+    """Recompute priority_score/priority_label for stored emails; returns a summary dict."""
+    start = time.perf_counter()
+    total = changed = 0
+    transitions = Counter()
+    for rows in db.iter_chunks(["id", "subject", "body", "sentiment", "priority_score", "priority_label"],
+                               chunk_size, statuses):
+        _, ids, subjects, bodies, sentiments, old_scores, old_labels = zip(*rows)
+        scores, labels = score_chunk(subjects, bodies, sentiments)
+        updates = []
+        for email_id, old_score, old_label, score, label in zip(ids, old_scores, old_labels, scores, labels):
+            score, label = float(score), str(label)
+            if old_label != label:
+                transitions[(old_label, label)] += 1
+            if old_label != label or old_score is None or abs(old_score - score) > 1e-9:
+                updates.append((email_id, score, label))
+        if updates and not dry_run:
+            with metrics.timed("db_write"):
+                db.update_priorities(updates)
+        total += len(rows)
+        changed += len(updates)
+        log(f"Rescored {total} emails ({changed} updated)")
+    seconds = time.perf_counter() - start
+    metrics.inc("emails_rescored_total", total)
+    return {
+        "rows": total,
+        "updated": changed,
+        "seconds": seconds,
+        "rows_per_s": total / seconds if seconds else 0.0,
+        "transitions": dict(transitions),
+        "dry_run": dry_run,
+    }
+
+def format_summary(summary):
+    lines = [f"{'Would update' if summary['dry_run'] else 'Updated'} {summary['updated']} of {summary['rows']} emails "
+             f"in {summary['seconds']:.2f}s ({summary['rows_per_s']:.0f} emails/s)"]
+    if summary["transitions"]:
+        lines.append("Label changes:")
+        for (old, new), count in sorted(summary["transitions"].items(), key=lambda item: -item[1]):
+            lines.append(f"  {old or '-'} -> {new}: {count}")
+    else:
+        lines.append("No label changes.")
+    return "\n".join(lines)
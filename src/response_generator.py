@@ -2,8 +2,13 @@
 import os
 from typing import Dict
 from rag_system import RAGSystem
+import metrics
 
 OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
+# "eager": LLM draft at ingest. "tiered": template draft at ingest, LLM upgrade later (see worker.upgrade_drafts)
+DRAFT_MODE = os.environ.get("DRAFT_MODE", "eager")
+# LLM draft upgrades allowed per UTC day in tiered mode
+LLM_DRAFT_BUDGET = int(os.environ.get("LLM_DRAFT_BUDGET", "200"))
 
 def _simple_template(email, processed, rag_context=None, contact_info=None):
     """Enhanced template with RAG context and empathetic responses"""
@@ -132,10 +137,28 @@ Write a specific response addressing their exact issue:
     return prompt
 
 class ResponseGenerator:
-    def __init__(self):
-        self.rag_system = RAGSystem()
+    def __init__(self, rag_system=None, use_llm=True, draft_mode=None):
+        # Reuse a shared RAGSystem when given so the embedding model is loaded once
+        self.rag_system = rag_system or RAGSystem()
+        # Bulk imports can opt out of LLM calls and draft from the template only
+        self.use_llm = use_llm
+        self.draft_mode = draft_mode or DRAFT_MODE
+        if self.draft_mode not in ("eager", "tiered"):
+            raise ValueError(f"Unknown draft mode {self.draft_mode!r}; use 'eager' or 'tiered'")
 
     def generate_response(self, email: Dict, processed: Dict) -> str:
+        return self.generate_draft(email, processed)[0]
+
+    def generate_draft(self, email: Dict, processed: Dict, use_llm=None):
+        """Return (draft, source) where source is "llm" or "template"; use_llm overrides the instance setting."""
+        with metrics.timed("generation"):
+            return self._generate_response(email, processed, self.use_llm if use_llm is None else use_llm)
+
+    def ingest_draft(self, email: Dict, processed: Dict):
+        """The draft stored when an email arrives: template-only in tiered mode, so ingest never waits on the LLM."""
+        return self.generate_draft(email, processed, use_llm=False if self.draft_mode == "tiered" else None)
+
+    def _generate_response(self, email: Dict, processed: Dict, use_llm=True):
         # Get RAG context
         query = f"{email.get('subject', '')} {email.get('body', '')}"
         kb_snippets = self.rag_system.retrieve_relevant_context(query, top_k=3)
@@ -153,21 +176,35 @@ class ResponseGenerator:
         })
         
         # Try OpenAI first, fallback to template
-        if OPENAI_KEY and OPENAI_AVAILABLE:
+        if not use_llm:
+            metrics.inc("draft_fallback_total", reason="llm_disabled")
+        elif OPENAI_KEY and OPENAI_AVAILABLE:
             try:
                 openai.api_key = OPENAI_KEY
                 prompt = _build_prompt(email, processed, kb_snippets, contact_info)
-                resp = openai.ChatCompletion.create(
-                    model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
-                    messages=[{"role": "system", "content": "You are a helpful support agent. Keep responses concise and under 150 words."},
-                              {"role": "user", "content": prompt}],
-                    max_tokens=200,  # Reduced to ensure complete responses
-                    temperature=0.1  # More focused responses
-                )
-                return resp["choices"][0]["message"]["content"].strip()
+                with metrics.timed("llm"):
+                    resp = openai.ChatCompletion.create(
+                        model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+                        messages=[{"role": "system", "content": "You are a helpful support agent. Keep responses concise and under 150 words."},
+                                  {"role": "user", "content": prompt}],
+                        max_tokens=200,  # Reduced to ensure complete responses
+                        temperature=0.1  # More focused responses
+                    )
+                draft = resp["choices"][0]["message"]["content"].strip()
+                metrics.inc("llm_requests_total", outcome="ok")
+                usage = resp.get("usage") or {}
+                for kind in ("prompt_tokens", "completion_tokens"):
+                    metrics.inc("llm_tokens_total", usage.get(kind, 0), kind=kind)
+                metrics.inc("drafts_generated_total", source="llm")
+                return draft, "llm"
             except Exception as e:
                 print(f"OpenAI error: {e}")
+                metrics.inc("llm_requests_total", outcome="error")
+                metrics.inc("draft_fallback_total", reason="llm_error")
+        else:
+            metrics.inc("draft_fallback_total", reason="llm_unavailable")
         
         # Enhanced fallback template with RAG context
+        metrics.inc("drafts_generated_total", source="template")
         rag_context = "\n".join(kb_snippets) if kb_snippets else None
-        return _simple_template(email, processed, rag_context, contact_info)
+        return _simple_template(email, processed, rag_context, contact_info), "template"
@@ -0,0 +1,31 @@
+# src/text_utils.py
+"""Message text helpers shared by the Gmail reader and the offline mailbox importer."""
+import html
+import re
+
+SUPPORT_KEYWORDS = ["support", "query", "request", "help"]
+
+def extract_email(sender):
+    match = re.search(r'<(.+?)>', str(sender))
+    if match:
+        return match.group(1)
+    return str(sender).strip()
+
+def same_sender(a, b):
+    """True when two From headers carry the same address, whatever the display names."""
+    return extract_email(a).lower() == extract_email(b).lower()
+
+def is_support_subject(subject):
+    return any(k in (subject or "").lower() for k in SUPPORT_KEYWORDS)
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)\b.*?</\1>", re.I | re.S)
+_BREAK_RE = re.compile(r"<\s*(br|/p|/div|/li|/tr|/h\d)\b[^>]*>", re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def html_to_text(markup):
+    """Plain-text rendering of an HTML body, good enough for classification and retrieval."""
+    text = _SCRIPT_STYLE_RE.sub(" ", markup)
+    text = _BREAK_RE.sub("\n", text)
+    text = html.unescape(_TAG_RE.sub(" ", text))
+    lines = (re.sub(r"[ \t\r\f\v\xa0]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
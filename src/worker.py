@@ -0,0 +1,329 @@
+# src/worker.py
+import itertools
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from database import Database
+from job_queue import JobQueue
+import dedup
+import metrics
+from text_utils import extract_email, same_sender
+
+# Seconds between worker heartbeats; well inside JobQueue.active_workers' 120 s window
+HEARTBEAT_INTERVAL = 15
+
+# Emails analysed together (and deduplicated against each other) while later pages are still fetched
+PROCESS_BATCH = 10
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items, pulling from `iterable` only as each list is needed."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def process_new_emails(emails, processor, responder, db, my_email=None, auto_send_urgent=True, log=print,
+                       deduplicate=True, reply=None):
+    """Analyse, draft and store fetched emails; shared by main.py, the worker and the dashboard.
+
+    `my_email` is the mailbox's own address (or a list of them); mail from it
+    is skipped. `reply(to, subject, body)` sends auto-replies, so each account
+    answers from its own mailbox (default: gmails_tools.send_reply). With
+    `deduplicate`, only the newest message per thread and one email per
+    near-duplicate cluster are analysed; the rest reuse their
+    representative's analysis and draft (see dedup.py). A
+    near-duplicate from another sender reuses only the sentiment and gets its
+    own template draft, since the representative's draft quotes its customer.
+    Copied drafts are never auto-sent.
+    """
+    own_addresses = {a.lower() for a in ([my_email] if isinstance(my_email, str) else my_email or [])}
+    processed_count = 0
+    sent_count = 0
+    candidates = []
+    for email in emails:
+        if db.is_replied(email["id"]):
+            log(f"Reply already sent for: {email['subject']}")
+            metrics.inc("emails_skipped_total", reason="already_replied")
+            continue
+        if db.is_archived(email["id"]):
+            metrics.inc("emails_skipped_total", reason="archived")
+            continue
+        sender_email = extract_email(email["sender"]).lower()
+        if sender_email in own_addresses:
+            metrics.inc("emails_skipped_total", reason="self")
+            continue
+        candidates.append(email)
+
+    if deduplicate:
+        with metrics.timed("dedup"):
+            plan = dedup.plan(candidates, db)
+        representatives, followers = plan.representatives, plan.followers
+    else:
+        plan, representatives, followers = None, candidates, []
+
+    def auto_sends(processed):
+        return auto_send_urgent and processed["priority_label"] == "Urgent"
+
+    def send_urgent(email, processed, draft):
+        # Auto-send urgent replies (optional)
+        if auto_sends(processed):
+            log(f"Sending auto-reply to {email['sender']}")
+            if reply is None:
+                # Imported here so offline imports run without the Gmail client installed
+                from gmails_tools import send_reply
+                send_reply(email["sender"], email["subject"], draft)
+            else:
+                reply(email["sender"], email["subject"], draft)
+            # Mark as replied
+            db.update_status(email["id"], "Replied")
+            return 1
+        return 0
+
+    def process(email):
+        with metrics.trace(email["id"]):
+            processed = processor.process_email(email)
+            # A reply that goes out unreviewed right away gets the LLM now, even in tiered draft mode
+            if auto_sends(processed):
+                draft, draft_source = responder.generate_draft(email, processed)
+            else:
+                draft, draft_source = responder.ingest_draft(email, processed)
+            db.save_email(email, processed, draft, draft_source)
+            if plan is not None and email["id"] in plan.signatures:
+                signature = plan.signatures[email["id"]]
+                db.save_signature(email["id"], signature.tobytes(), dedup.band_keys(signature))
+            metrics.inc("emails_processed_total", priority=processed["priority_label"])
+            log(f"Processed: {email['subject']} | Priority: {processed['priority_label']}")
+            return send_urgent(email, processed, draft)
+
+    for email in representatives:
+        sent_count += process(email)
+        processed_count += 1
+
+    def process_for_sender(email, representative_id):
+        # Another customer's near-duplicate: their summary, extraction and draft must not reach this sender
+        row = db.sender_and_sentiment(representative_id)
+        if row is None or same_sender(row[0], email["sender"]):
+            return None
+        with metrics.trace(email["id"]):
+            processed = processor.process_email(email, sentiment=row[1])
+            use_llm = None if auto_sends(processed) else False
+            draft, draft_source = responder.generate_draft(email, processed, use_llm=use_llm)
+            db.save_email(email, processed, draft, draft_source, duplicate_of=representative_id)
+            return send_urgent(email, processed, draft)
+
+    deduplicated = 0
+    for email, representative_id, reason in followers:
+        status = "Superseded" if reason == "thread" else "Pending"
+        sent = process_for_sender(email, representative_id) if reason == "near_duplicate" else None
+        if sent is not None:
+            sent_count += sent
+            deduplicated += 1
+            metrics.inc("emails_deduplicated_total", reason=reason)
+            log(f"Duplicate (other sender): {email['subject']} -> {representative_id}")
+            continue
+        if not db.save_follower(email, representative_id, status):
+            sent_count += process(email)
+            processed_count += 1
+            continue
+        deduplicated += 1
+        metrics.inc("emails_deduplicated_total", reason=reason)
+        log(f"{'Superseded' if reason == 'thread' else 'Duplicate'}: {email['subject']} -> {representative_id}")
+
+    if deduplicate:
+        # Earlier stored messages of these threads are now answered by their newest message
+        for email in representatives + [e for e, _, reason in followers if reason == "near_duplicate"]:
+            superseded = db.supersede_thread(email.get("threadId"), email["id"])
+            if superseded:
+                metrics.inc("emails_deduplicated_total", superseded, reason="thread")
+                deduplicated += superseded
+    return {"processed": processed_count, "sent": sent_count, "deduplicated": deduplicated}
+
+def upgrade_drafts(responder, db, limit=10, budget=None, email_id=None, log=print):
+    """Replace stored template drafts with LLM drafts, Urgent first.
+
+    At most `limit` emails are drafted, and no more than what is left of the
+    daily `budget` (LLM_DRAFT_BUDGET) of LLM drafts. With `email_id` only that
+    email is upgraded and the budget is not applied, since an agent is waiting
+    for it. Stops at the first template fallback: the LLM is unavailable.
+    """
+    trigger = "on_demand" if email_id is not None else "background"
+    if email_id is None:
+        if budget is None:
+            from response_generator import LLM_DRAFT_BUDGET as budget
+        limit = min(limit, max(budget - db.llm_drafts_today(), 0))
+    upgraded = 0
+    shared = set()
+    for row in db.template_drafts(limit, email_id) if limit else []:
+        if row["id"] in shared:
+            continue
+        email = {k: row[k] for k in ("id", "sender", "subject", "body", "date")}
+        processed = {k: row[k] for k in ("sentiment", "priority_label", "priority_score", "summary")}
+        draft, source = responder.generate_draft(email, processed, use_llm=True)
+        if source != "llm":
+            log(f"LLM unavailable, keeping template draft for: {email['subject']}")
+            break
+        # The draft quotes this sender's email, so only their own duplicates may share it
+        own = [follower_id for follower_id, follower_sender in db.template_followers(email["id"])
+               if same_sender(follower_sender, email["sender"])]
+        db.upgrade_draft(email["id"], draft, own)
+        shared.update(own)
+        upgraded += 1
+        metrics.inc("draft_upgrades_total", trigger=trigger, priority=row["priority_label"])
+        log(f"Upgraded draft: {email['subject']} | Priority: {row['priority_label']}")
+    return {"upgraded": upgraded, "followers": len(shared)}
+
+class Worker:
+    """Long-running consumer of the job queue with a built-in fetch scheduler."""
+
+    def __init__(self, db_path="db/emails.db", queue_path="db/jobs.db", accounts=None, worker_id=None,
+                 lease_seconds=600):
+        # Imported here: accounts.py builds on process_new_emails from this module
+        from accounts import load_accounts
+        self.db = Database(db_path)
+        self.queue = JobQueue(queue_path)
+        self.accounts = accounts or load_accounts()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self._processor = None
+        self._responder = None
+        self._stopping = False
+        self._stopped = threading.Event()
+        self._next_fetch = None
+        # The job being run, whose lease the heartbeat thread keeps renewing
+        self._current_job = None
+        # Set when the last background upgrade filled its batch, so idle time keeps draining template drafts
+        self._upgrade_backlog = False
+        self.handlers = {
+            "fetch": self._fetch,
+            "regenerate": self._regenerate,
+            "send": self._send,
+            "send_pending": self._send_pending,
+            "upgrade_drafts": self._upgrade_drafts,
+        }
+
+    def _load_models(self):
+        # Models are loaded once per worker process and shared by every job
+        if self._processor is None:
+            from rag_system import RAGSystem
+            from email_processor import EmailProcessor
+            from response_generator import ResponseGenerator
+            rag_system = RAGSystem()
+            self._processor = EmailProcessor(rag_system=rag_system, cache=self.db)
+            self._responder = ResponseGenerator(rag_system=rag_system)
+        return self._processor, self._responder
+
+    def _fetch(self, payload):
+        # Every account (or the one named in the payload) is polled concurrently with the shared models
+        from accounts import poll_accounts
+        accounts = [a for a in self.accounts if payload.get("account") in (None, a.name)]
+        if not accounts:
+            raise ValueError(f"Unknown account: {payload['account']}")
+        processor, responder = self._load_models()
+        return poll_accounts(accounts, processor, responder, self.db, max_per_poll=payload.get("max_results", 10))
+
+    def _get_email(self, email_id):
+        cur = self.db.conn.cursor()
+        cur.execute("SELECT id, sender, subject, body, date, draft, account FROM emails WHERE id=?", (email_id,))
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"Unknown email id: {email_id}")
+        return dict(zip(["id", "sender", "subject", "body", "date", "draft", "account"], row))
+
+    def _regenerate(self, payload):
+        processor, responder = self._load_models()
+        email = self._get_email(payload["email_id"])
+        processed = processor.process_email(email)
+        draft, draft_source = responder.generate_draft(email, processed)
+        self.db.update_draft(email["id"], draft, draft_source)
+        return {"email_id": email["id"]}
+
+    def _upgrade_drafts(self, payload):
+        _, responder = self._load_models()
+        if payload.get("email_id") is None and responder.draft_mode != "tiered":
+            return {"upgraded": 0, "followers": 0}
+        result = upgrade_drafts(responder, self.db, limit=payload.get("limit", 10), email_id=payload.get("email_id"))
+        if payload.get("email_id") is None:
+            self._upgrade_backlog = result["upgraded"] >= payload.get("limit", 10)
+        return result
+
+    def _send(self, payload):
+        email = self._get_email(payload["email_id"])
+        # A retried job must not send the same reply twice
+        if self.db.is_replied(email["id"]):
+            return {"email_id": email["id"], "sent": False}
+        from accounts import find_account
+        find_account(self.accounts, email["account"]).send_reply(email["sender"], email["subject"],
+                                                                  payload.get("draft") or email["draft"])
+        self.db.update_status(email["id"], "Replied")
+        return {"email_id": email["id"], "sent": True}
+
+    def _send_pending(self, payload):
+        cur = self.db.conn.cursor()
+        cur.execute("SELECT id FROM emails WHERE status='Pending'")
+        sent = sum(self._send({"email_id": email_id})["sent"] for (email_id,) in cur.fetchall())
+        return {"sent": sent}
+
+    def run_job(self, job):
+        handler = self.handlers.get(job["kind"])
+        self._current_job = job["id"]
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+            result = handler(job["payload"])
+        except Exception as e:
+            print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            metrics.inc("jobs_total", kind=job["kind"], outcome="failed")
+            self.queue.fail(job["id"], self.worker_id, e)
+            return False
+        finally:
+            self._current_job = None
+        metrics.inc("jobs_total", kind=job["kind"], outcome="done")
+        self.queue.complete(job["id"], self.worker_id, result)
+        print(f"Job {job['id']} ({job['kind']}) done: {result}")
+        return True
+
+    def stop(self, *args):
+        self._stopping = True
+        self._stopped.set()
+
+    def _heartbeat_loop(self):
+        # A thread of its own, so a long fetch or upgrade job neither makes a live worker look dead nor
+        # outlives its lease and gets claimed by a second worker.
+        # It uses its own connection: the main loop's claim transactions must not include its writes.
+        queue = JobQueue(self.queue.db_path)
+        while True:
+            queue.heartbeat(self.worker_id, {"next_fetch": self._next_fetch, "metrics": metrics.REGISTRY.snapshot()})
+            job_id = self._current_job
+            if job_id is not None:
+                queue.extend_lease(job_id, self.worker_id, self.lease_seconds)
+            if self._stopped.wait(HEARTBEAT_INTERVAL):
+                return
+
+    def run_forever(self, interval=60, jitter=10, max_batch=10, idle_sleep=2):
+        """Schedule a mailbox fetch every `interval` (+ up to `jitter`) seconds and drain the queue."""
+        signal.signal(signal.SIGTERM, self.stop)
+        next_fetch = self._next_fetch = time.time()
+        threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True).start()
+        print(f"Worker {self.worker_id} started (interval={interval}s, jitter={jitter}s, max_batch={max_batch})")
+        while not self._stopping:
+            now = time.time()
+            if now >= next_fetch:
+                self.queue.enqueue("fetch", {"max_results": max_batch}, priority=50, dedupe_key="fetch")
+                # Below fetch, so new mail is never held up by draft upgrades; no-op in eager draft mode
+                self.queue.enqueue("upgrade_drafts", {"limit": max_batch}, priority=70, dedupe_key="upgrade_drafts")
+                next_fetch = self._next_fetch = now + interval + random.uniform(0, jitter)
+            job = self.queue.claim(self.worker_id, self.lease_seconds)
+            if job is None:
+                if self._upgrade_backlog:
+                    self._upgrade_backlog = False
+                    self.queue.enqueue("upgrade_drafts", {"limit": max_batch}, priority=70, dedupe_key="upgrade_drafts")
+                    continue
+                time.sleep(idle_sleep)
+                continue
+            self.run_job(job)
+        print(f"Worker {self.worker_id} stopped")
@@ -0,0 +1,65 @@
+"""Threads and near-duplicates must never carry one customer's data onto another's email."""
+import json
+import re
+from database import Database
+import dedup
+from worker import process_new_emails
+
+BODY = ("My account is locked and I cannot log in since this morning. I tried resetting the password "
+        "twice but the reset link never arrives. Please help me get access back as soon as possible.")
+
+class FakeProcessor:
+    def process_email(self, email, is_paid=False, sentiment=None):
+        phones = re.findall(r"\d{3}-\d{3}-\d{4}", email["body"])
+        return {"sentiment": sentiment or "negative", "priority_label": "Medium", "priority_score": 3.0,
+                "summary": email["body"][:80], "extracted": {"phones": phones}, "is_frustrated": False,
+                "contact_info": {"phones": phones, "emails": []}, "requirements": []}
+
+class FakeResponder:
+    def ingest_draft(self, email, processed):
+        return self.generate_draft(email, processed)
+
+    def generate_draft(self, email, processed, use_llm=None):
+        return f"Reply to {email['sender']}: {processed['summary']}", "template"
+
+def make_email(email_id, thread_id, sender, body, date):
+    return {"id": email_id, "threadId": thread_id, "sender": sender, "subject": "Support request: locked out",
+            "body": body, "date": date}
+
+def test_thread_of_cross_sender_duplicate_keeps_its_own_sender(tmp_path):
+    db = Database(str(tmp_path / "emails.db"))
+    bob = make_email("b1", "tb", "bob@example.com", BODY + " Call me on 555-123-4567.",
+                     "Mon, 1 Jan 2024 09:00:00 +0000")
+    process_new_emails([bob], FakeProcessor(), FakeResponder(), db, auto_send_urgent=False, log=lambda m: None)
+
+    alice_old = make_email("a1", "ta", "Alice <alice@example.com>", "Hello, is anyone there? I need help.",
+                           "Mon, 1 Jan 2024 10:00:00 +0000")
+    alice_new = make_email("a2", "ta", "Alice <alice@example.com>", BODY + " Call me on 555-987-6543.",
+                           "Mon, 1 Jan 2024 11:00:00 +0000")
+    plan = dedup.plan([alice_old, alice_new], db)
+    targets = {email["id"]: (rep_id, reason) for email, rep_id, reason in plan.followers}
+    assert targets == {"a2": ("b1", "near_duplicate"), "a1": ("a2", "thread")}
+
+    counts = process_new_emails([alice_old, alice_new], FakeProcessor(), FakeResponder(), db,
+                                auto_send_urgent=False, log=lambda m: None)
+    assert counts["processed"] == 0
+
+    rows = {row[0]: row[1:] for row in db.conn.execute(
+        "SELECT id, duplicate_of, contact_info, summary, draft FROM emails WHERE id IN ('a1', 'a2')")}
+    assert rows["a2"][0] == "b1"
+    assert rows["a1"][0] == "a2"
+    for duplicate_of, contact_info, summary, draft in rows.values():
+        assert "555-123-4567" not in json.dumps(json.loads(contact_info))
+        assert "555-123-4567" not in summary
+        assert "bob@example.com" not in (draft or "")
+
+def test_same_sender_thread_follows_final_representative(tmp_path):
+    db = Database(str(tmp_path / "emails.db"))
+    first = make_email("c1", "tc1", "carol@example.com", BODY, "Mon, 1 Jan 2024 09:00:00 +0000")
+    process_new_emails([first], FakeProcessor(), FakeResponder(), db, auto_send_urgent=False, log=lambda m: None)
+
+    older = make_email("c2", "tc2", "carol@example.com", "Any update?", "Mon, 1 Jan 2024 10:00:00 +0000")
+    newer = make_email("c3", "tc2", "Carol <carol@example.com>", BODY, "Mon, 1 Jan 2024 11:00:00 +0000")
+    plan = dedup.plan([older, newer], db)
+    targets = {email["id"]: rep_id for email, rep_id, _ in plan.followers}
+    assert targets == {"c3": "c1", "c2": "c1"}
@@ -0,0 +1,30 @@
+"""Tiered draft mode: template drafts at ingest, except for replies that are auto-sent right away."""
+from database import Database
+from worker import process_new_emails
+
+class FakeProcessor:
+    def process_email(self, email, is_paid=False, sentiment=None):
+        label = "Urgent" if "URGENT" in email["subject"] else "Low"
+        return {"sentiment": "neutral", "priority_label": label, "priority_score": 0.0, "summary": email["body"]}
+
+class TieredResponder:
+    draft_mode = "tiered"
+
+    def ingest_draft(self, email, processed):
+        return self.generate_draft(email, processed, use_llm=False)
+
+    def generate_draft(self, email, processed, use_llm=None):
+        return ("template", "template") if use_llm is False else ("llm", "llm")
+
+def test_auto_sent_urgent_email_gets_llm_draft(tmp_path):
+    db = Database(str(tmp_path / "emails.db"))
+    sent = []
+    emails = [{"id": "u1", "threadId": "u1", "sender": "a@example.com", "subject": "URGENT support: site down",
+               "body": "Our whole site is down since the deploy.", "date": "Mon, 1 Jan 2024 09:00:00 +0000"},
+              {"id": "l1", "threadId": "l1", "sender": "b@example.com", "subject": "Support question",
+               "body": "How do I change my avatar picture?", "date": "Mon, 1 Jan 2024 10:00:00 +0000"}]
+    process_new_emails(emails, FakeProcessor(), TieredResponder(), db,
+                       reply=lambda to, subject, body: sent.append(body), log=lambda m: None)
+    assert sent == ["llm"]
+    rows = dict(db.conn.execute("SELECT id, draft_source FROM emails"))
+    assert rows == {"u1": "llm", "l1": "template"}